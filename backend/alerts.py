@@ -0,0 +1,275 @@
+"""
+Low-balance and budget-overrun alerts
+The write handlers mark what a write touched (an account, a category's
+budget for a month) and a background task re-evaluates just those, after a
+short debounce so a burst of writes is evaluated once. One alert per account
+or budget-month is active at a time in the `alerts` collection: it is raised
+when the threshold is crossed, updated while it stays crossed and resolved
+once it no longer is. Each transition is recorded in the change feed as an
+`alerts` event, so Server-Sent Events subscribers on every worker see it.
+
+  lowBalance     account balance <= lowBalanceThreshold
+  budgetOverrun  a month's completed expenses in a category > monthlyBudget
+"""
+
+import asyncio
+import logging
+from datetime import date, datetime, timezone
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+import orjson
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from balances import balance_delta
+from rollups import ROLLUPS_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+ALERTS_COLLECTION = "alerts"
+LOW_BALANCE = "lowBalance"
+BUDGET_OVERRUN = "budgetOverrun"
+
+# Writes arriving within this long of the first are evaluated together
+DEBOUNCE_SECONDS = 0.5
+
+# Comment lines keep idle streams open through proxies
+HEARTBEAT_SECONDS = 15
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def current_month() -> str:
+    return date.today().strftime("%Y-%m")
+
+
+def public_alert(alert: dict) -> dict:
+    """An alert document as returned by the API"""
+    alert = dict(alert)
+    alert["id"] = str(alert.pop("_id"))
+    for field in ("createdAt", "updatedAt", "resolvedAt"):
+        value = alert.get(field)
+        if isinstance(value, datetime):
+            # Motor returns naive UTC datetimes; documents built here are aware
+            alert[field] = value.replace(tzinfo=None).isoformat(timespec="milliseconds") + "Z"
+    return alert
+
+
+def alert_event(change: str, alert: dict) -> dict:
+    """Change feed event for a raised, updated or resolved alert; it carries the whole alert"""
+    alert = public_alert(alert)
+    return {
+        "collection": ALERTS_COLLECTION, "op": "create" if change == "raised" else "update",
+        "id": alert["id"], "data": alert, "change": change
+    }
+
+
+class AlertEngine:
+    def __init__(self, feed, debounce: float = DEBOUNCE_SECONDS):
+        self.feed = feed
+        self.debounce = debounce
+        self._accounts: Set[int] = set()
+        self._budgets: Set[Tuple[int, str]] = set()
+        self._everything = False
+        self._wake = asyncio.Event()
+
+    # --- Marking what changed (called by the write handlers) ---
+
+    def touch_transactions(self, transactions: Iterable[dict]):
+        """Transactions written, as their before and/or after images"""
+        for transaction in transactions:
+            if not balance_delta(transaction):
+                continue
+            self._accounts.add(transaction["accountId"])
+            if transaction["type"] == "expense":
+                self._budgets.add((transaction["categoryId"], transaction["date"][:7]))
+        self._wake.set()
+
+    def touch_account(self, account_id: int):
+        self._accounts.add(account_id)
+        self._wake.set()
+
+    def touch_budget(self, category_id: int, month: Optional[str] = None):
+        self._budgets.add((category_id, month or current_month()))
+        self._wake.set()
+
+    def touch_all(self):
+        """Re-evaluate every account and this month's budgets (after imports, reconciles)"""
+        self._everything = True
+        self._wake.set()
+
+    async def run(self, db):
+        self.touch_all()
+        while True:
+            await self._wake.wait()
+            await asyncio.sleep(self.debounce)
+            self._wake.clear()
+            accounts, budgets, everything = self._accounts, self._budgets, self._everything
+            self._accounts, self._budgets, self._everything = set(), set(), False
+            try:
+                if everything:
+                    await self.evaluate_all(db)
+                await self.evaluate(db, accounts, budgets)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # The touched entities are re-evaluated on their next write, or by POST /api/alerts/evaluate
+                logger.exception("Alert evaluation failed")
+
+    # --- Evaluation ---
+
+    async def evaluate_all(self, db):
+        accounts = await db.accounts.distinct("id")
+        budgets = await db.budgets.distinct("categoryId")
+        # Active alerts for accounts or budgets that no longer exist get resolved too
+        active = await db[ALERTS_COLLECTION].find(
+            {"status": "active"}, {"_id": 0, "accountId": 1, "categoryId": 1, "month": 1}
+        ).to_list(None)
+        month = current_month()
+        await self.evaluate(
+            db,
+            set(accounts) | {alert["accountId"] for alert in active if "accountId" in alert},
+            {(category_id, month) for category_id in budgets}
+            | {(alert["categoryId"], alert["month"]) for alert in active if "categoryId" in alert}
+        )
+
+    async def evaluate(self, db, account_ids: Set[int], budget_keys: Set[Tuple[int, str]]):
+        # Transitions are collected and recorded in the feed together
+        events: List[dict] = []
+        if account_ids:
+            await self._evaluate_accounts(db, account_ids, events)
+        if budget_keys:
+            await self._evaluate_budgets(db, budget_keys, events)
+        await self.feed.record(db, events)
+
+    async def _evaluate_accounts(self, db, account_ids: Set[int], events: List[dict]):
+        accounts = {
+            account["id"]: account
+            for account in await db.accounts.find(
+                {"id": {"$in": list(account_ids)}},
+                {"_id": 0, "id": 1, "name": 1, "balance": 1, "lowBalanceThreshold": 1}
+            ).to_list(None)
+        }
+        for account_id in account_ids:
+            account = accounts.get(account_id)
+            if account is None:
+                await self._resolve(db, events, {"kind": LOW_BALANCE, "accountId": account_id})
+                continue
+            breached = account["balance"] <= account["lowBalanceThreshold"]
+            await self._set(db, events, {"kind": LOW_BALANCE, "accountId": account_id}, breached, {
+                "name": account["name"],
+                "value": round(account["balance"], 2),
+                "threshold": account["lowBalanceThreshold"],
+                "message": f"{account['name']} balance {account['balance']:.2f} "
+                           f"is at or below {account['lowBalanceThreshold']:.2f}"
+            })
+
+    async def _evaluate_budgets(self, db, budget_keys: Set[Tuple[int, str]], events: List[dict]):
+        category_ids = list({category_id for category_id, _ in budget_keys})
+        months = list({month for _, month in budget_keys})
+        budgets, spending = await asyncio.gather(
+            db.budgets.find(
+                {"categoryId": {"$in": category_ids}}, {"_id": 0, "categoryId": 1, "categoryName": 1, "monthlyBudget": 1}
+            ).to_list(None),
+            db[ROLLUPS_COLLECTION].aggregate([
+                {"$match": {"categoryId": {"$in": category_ids}, "month": {"$in": months},
+                            "type": "expense", "status": "completed"}},
+                {"$group": {"_id": {"categoryId": "$categoryId", "month": "$month"}, "total": {"$sum": "$total"}}}
+            ]).to_list(None)
+        )
+        budgets = {budget["categoryId"]: budget for budget in budgets}
+        spent: Dict[Tuple[int, str], float] = {
+            (row["_id"]["categoryId"], row["_id"]["month"]): row["total"] for row in spending
+        }
+        for category_id, month in budget_keys:
+            key = {"kind": BUDGET_OVERRUN, "categoryId": category_id, "month": month}
+            budget = budgets.get(category_id)
+            if budget is None:
+                await self._resolve(db, events, key)
+                continue
+            total = round(spent.get((category_id, month), 0), 2)
+            await self._set(db, events, key, total > budget["monthlyBudget"], {
+                "name": budget["categoryName"],
+                "value": total,
+                "threshold": budget["monthlyBudget"],
+                "message": f"{budget['categoryName']} spending {total:.2f} "
+                           f"is over the {budget['monthlyBudget']:.2f} budget for {month}"
+            })
+
+    async def _set(self, db, events: List[dict], key: dict, breached: bool, fields: dict):
+        if not breached:
+            await self._resolve(db, events, key, fields)
+            return
+        now = _now()
+        alerts = db[ALERTS_COLLECTION]
+        active = await alerts.find_one({**key, "status": "active"})
+        if active is None:
+            alert = {**key, **fields, "status": "active", "createdAt": now, "updatedAt": now}
+            try:
+                await alerts.insert_one(alert)
+            except DuplicateKeyError:
+                # Another worker raised it first (one active alert per key, enforced by index)
+                return
+            events.append(alert_event("raised", alert))
+        elif any(active.get(field) != value for field, value in fields.items()):
+            alert = await alerts.find_one_and_update(
+                {"_id": active["_id"], "status": "active"},
+                {"$set": {**fields, "updatedAt": now}},
+                return_document=ReturnDocument.AFTER
+            )
+            if alert:
+                events.append(alert_event("updated", alert))
+
+    async def _resolve(self, db, events: List[dict], key: dict, fields: Optional[dict] = None):
+        now = _now()
+        alert = await db[ALERTS_COLLECTION].find_one_and_update(
+            {**key, "status": "active"},
+            {"$set": {**(fields or {}), "status": "resolved", "resolvedAt": now, "updatedAt": now}},
+            return_document=ReturnDocument.AFTER
+        )
+        if alert:
+            events.append(alert_event("resolved", alert))
+
+    # --- Server-Sent Events ---
+
+    async def event_stream(self, db, heartbeat: float = HEARTBEAT_SECONDS) -> AsyncIterator[bytes]:
+        """
+        text/event-stream body: a `snapshot` event listing the active alerts,
+        then one `alert` event per change ({change, alert}) made by any worker
+        """
+        loop = asyncio.get_running_loop()
+        with self.feed.subscribe() as queue:
+            active = await list_alerts(db, "active")
+            yield b"retry: 3000\nevent: snapshot\ndata: " + orjson.dumps(active) + b"\n\n"
+            # Other collections' events don't count as activity on this stream
+            keepalive_at = loop.time() + heartbeat
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), max(keepalive_at - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    keepalive_at = loop.time() + heartbeat
+                    continue
+                if event is None:
+                    # Dropped for falling behind; the client reconnects and gets a fresh snapshot
+                    return
+                if event["collection"] != ALERTS_COLLECTION:
+                    continue
+                if event["op"] == "reset":
+                    active = await list_alerts(db, "active")
+                    yield b"event: snapshot\ndata: " + orjson.dumps(active) + b"\n\n"
+                else:
+                    yield (f"id: {event['id']}\nevent: alert\ndata: ".encode()
+                           + orjson.dumps({"change": event["change"], "alert": event["data"]}) + b"\n\n")
+                keepalive_at = loop.time() + heartbeat
+
+
+async def list_alerts(db, status: str = "active", kind: Optional[str] = None, limit: int = 100) -> List[dict]:
+    query = {} if status == "all" else {"status": status}
+    if kind:
+        query["kind"] = kind
+    alerts = await db[ALERTS_COLLECTION].find(query).sort("updatedAt", -1).limit(limit).to_list(limit)
+    return [public_alert(alert) for alert in alerts]
+
@@ -0,0 +1,183 @@
+"""
+Time-series analytics
+Income, expense, net and count series per day, week, month or quarter,
+optionally split by category or account. Whole-month ranges at month or
+quarter granularity are summed from the rollups collection (a few documents
+per month); anything finer groups the ledger with $dateTrunc. Either way
+the series are zero-filled so every period in the range has a point.
+"""
+
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from dates import is_month_aligned
+from rollups import ROLLUPS_COLLECTION
+
+GRANULARITIES = ["day", "week", "month", "quarter"]
+METRICS = ["income", "expenses", "net", "count"]
+GROUP_BY = {"category": ("categoryId", "categories"), "account": ("accountId", "accounts")}
+
+# Periods shown when the request gives no start date
+DEFAULT_PERIODS = {"day": 30, "week": 12, "month": 12, "quarter": 8}
+
+# Keeps a day-level request over decades from producing an enormous response
+MAX_PERIODS = 3660
+
+
+def period_start(day: date, granularity: str) -> date:
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        # ISO weeks start on Monday, as $dateTrunc does with startOfWeek "monday"
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+
+
+def add_periods(start: date, granularity: str, count: int) -> date:
+    """Move a period start `count` periods forward (or back, if negative)"""
+    if granularity == "day":
+        return start + timedelta(days=count)
+    if granularity == "week":
+        return start + timedelta(weeks=count)
+    months = start.month - 1 + count * (1 if granularity == "month" else 3)
+    return date(start.year + months // 12, months % 12 + 1, 1)
+
+
+def period_range(first: date, last: date, granularity: str) -> List[date]:
+    periods, current = [], period_start(first, granularity)
+    while current <= last:
+        periods.append(current)
+        if len(periods) > MAX_PERIODS:
+            raise ValueError(f"Range spans more than {MAX_PERIODS} {granularity} periods")
+        current = add_periods(current, granularity, 1)
+    return periods
+
+
+def _totals_group(period, key: Optional[str], amount: str, count) -> dict:
+    # Same shape over rollups (pre-summed) and raw transactions (one row each)
+    return {
+        "$group": {
+            "_id": {"period": period, "key": f"${key}" if key else None},
+            "income": {"$sum": {"$cond": [{"$eq": ["$type", "income"]}, amount, 0]}},
+            "expenses": {"$sum": {"$cond": [{"$eq": ["$type", "expense"]}, amount, 0]}},
+            "count": {"$sum": count}
+        }
+    }
+
+
+def ledger_pipeline(match: dict, granularity: str, key: Optional[str]) -> list:
+    # Legacy dates that don't parse give a null period and are left out rather than failing the query
+    truncate = {
+        "date": {"$dateFromString": {"dateString": "$date", "format": "%Y-%m-%d", "onError": None, "onNull": None}},
+        "unit": granularity
+    }
+    if granularity == "week":
+        truncate["startOfWeek"] = "monday"
+    return [
+        {"$match": match},
+        _totals_group({"$dateTrunc": truncate}, key, "$amount", 1),
+        {"$match": {"_id.period": {"$ne": None}}}
+    ]
+
+
+def rollup_pipeline(match: dict, key: Optional[str]) -> list:
+    return [{"$match": match}, _totals_group("$month", key, "$total", "$count")]
+
+
+def _period_of(value) -> date:
+    # $dateTrunc yields datetimes; rollup months are "YYYY-MM" strings
+    if isinstance(value, datetime):
+        return value.date()
+    return date.fromisoformat(f"{value}-01")
+
+
+def _metric(totals: dict, metric: str, index: int) -> float:
+    if metric == "net":
+        return round(totals["income"][index] - totals["expenses"][index], 2)
+    if metric == "count":
+        return totals["count"][index]
+    return round(totals[metric][index], 2)
+
+
+async def timeseries(
+    db,
+    granularity: str = "month",
+    metric: str = "expenses",
+    group_by: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    filters: Optional[Dict] = None,
+    source: str = "auto"
+) -> dict:
+    """
+    Chart-ready series: one label per period start (ISO date) and one dataset
+    per group. `filters` holds equality filters on status, accountId and
+    categoryId, which both the ledger and the rollups carry.
+    Raises ValueError for impossible dates or oversized ranges.
+    """
+    if date_to:
+        last = date.fromisoformat(date_to)
+    else:
+        # Through the end of the current period, which keeps default month/quarter ranges on the rollups
+        current = period_start(date.today(), granularity)
+        last = add_periods(current, granularity, 1) - timedelta(days=1)
+    if date_from:
+        first = date.fromisoformat(date_from)
+    else:
+        first = add_periods(period_start(last, granularity), granularity, 1 - DEFAULT_PERIODS[granularity])
+    periods = period_range(first, last, granularity)
+    index = {period: position for position, period in enumerate(periods)}
+
+    # Months are the rollups' finest grain, so only whole-month ranges can use them
+    use_rollups = source == "auto" and granularity in ("month", "quarter") \
+        and is_month_aligned(first.isoformat(), last.isoformat())
+    key, names_collection = GROUP_BY[group_by] if group_by else (None, None)
+    match = dict(filters or {})
+    if use_rollups:
+        match["month"] = {"$gte": first.isoformat()[:7], "$lte": last.isoformat()[:7]}
+        rows_query = db[ROLLUPS_COLLECTION].aggregate(rollup_pipeline(match, key)).to_list(None)
+    else:
+        match["date"] = {"$gte": first.isoformat(), "$lte": last.isoformat()}
+        rows_query = db.transactions.aggregate(ledger_pipeline(match, granularity, key)).to_list(None)
+
+    if names_collection:
+        rows, named = await asyncio.gather(
+            rows_query, db[names_collection].find({}, {"_id": 0, "id": 1, "name": 1}).to_list(None)
+        )
+        names = {doc["id"]: doc["name"] for doc in named}
+    else:
+        rows, names = await rows_query, {}
+
+    # Rollup months fold into their quarter here, so the sums accumulate
+    series: Dict = {}
+    for row in rows:
+        position = index.get(period_start(_period_of(row["_id"]["period"]), granularity))
+        if position is None:
+            continue
+        totals = series.setdefault(row["_id"]["key"], {
+            "income": [0.0] * len(periods), "expenses": [0.0] * len(periods), "count": [0] * len(periods)
+        })
+        for field in ("income", "expenses", "count"):
+            totals[field][position] += row[field]
+
+    datasets = []
+    for group, totals in series.items():
+        data = [_metric(totals, metric, position) for position in range(len(periods))]
+        label = names.get(group, str(group)) if group_by else metric.capitalize()
+        datasets.append({"label": label, "key": group, "data": data})
+    # Largest groups first, so a chart can keep just the leading datasets
+    datasets.sort(key=lambda dataset: -sum(abs(value) for value in dataset["data"]))
+    if not datasets and not group_by:
+        datasets.append({"label": metric.capitalize(), "key": None, "data": [0] * len(periods)})
+
+    return {
+        "granularity": granularity,
+        "metric": metric,
+        "groupBy": group_by,
+        "source": "rollups" if use_rollups else "ledger",
+        "labels": [period.isoformat() for period in periods],
+        "datasets": datasets
+    }
@@ -0,0 +1,273 @@
+"""
+Account balances maintained from the ledger
+An account's balance is its openingBalance plus its completed income minus
+its completed expenses; pending and overdue transactions don't move it. The
+transaction write handlers apply signed deltas with $inc, so balances stay
+current without rescanning the ledger.
+
+account_balance_days holds each account's net change per day, kept current
+the same way. The balance at the end of any day is the opening balance plus
+the changes up to that day, so point-in-time lookups and history charts read
+one small document per active day instead of the transactions.
+"""
+
+import asyncio
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import DeleteOne, ReturnDocument, UpdateOne
+
+BALANCE_DAYS_COLLECTION = "account_balance_days"
+
+# Longest history one request may return (about ten years of days)
+MAX_HISTORY_DAYS = 3660
+
+# Stored balances further than this from the recomputed value count as drift
+DRIFT_TOLERANCE = 0.005
+
+
+def balance_delta(transaction: dict) -> float:
+    """How much a transaction moves its account's balance"""
+    if transaction.get("status") != "completed":
+        return 0
+    return transaction["amount"] if transaction["type"] == "income" else -transaction["amount"]
+
+
+async def _write(db, changes: List[Tuple[dict, int]]) -> Dict[int, float]:
+    # Sums deltas per account and per (account, day) first: one update each
+    accounts: Dict[int, float] = {}
+    days: Dict[Tuple[int, str], Tuple[float, int]] = {}
+    for transaction, sign in changes:
+        delta = balance_delta(transaction)
+        if not delta:
+            continue
+        account_id = transaction["accountId"]
+        accounts[account_id] = accounts.get(account_id, 0) + sign * delta
+        total, count = days.get((account_id, transaction["date"]), (0, 0))
+        days[(account_id, transaction["date"])] = (total + sign * delta, count + sign)
+
+    # An edit that keeps the account and amount but moves the date changes days only
+    accounts = {account_id: delta for account_id, delta in accounts.items() if delta}
+    days = {key: change for key, change in days.items() if change != (0, 0)}
+    # Each $inc hands back the balance it produced, so callers needn't read it again
+    writes = [
+        db.accounts.find_one_and_update(
+            {"id": account_id}, {"$inc": {"balance": delta}},
+            projection={"_id": 0, "id": 1, "balance": 1}, return_document=ReturnDocument.AFTER
+        )
+        for account_id, delta in accounts.items()
+    ]
+    if days:
+        writes.append(db[BALANCE_DAYS_COLLECTION].bulk_write([
+            UpdateOne({"accountId": account_id, "date": day}, {"$inc": {"delta": delta, "count": count}}, upsert=True)
+            for (account_id, day), (delta, count) in days.items()
+        ], ordered=False))
+    results = await asyncio.gather(*writes)
+    # Accounts deleted in the meantime come back as None
+    return {account["id"]: account["balance"] for account in results[:len(accounts)] if account}
+
+
+async def apply_balance_change(db, old: dict = None, new: dict = None) -> Dict[int, float]:
+    """Move a transaction's effect from `old` to `new` (either may be None); the new balance of each account moved"""
+    changes = []
+    if old:
+        changes.append((old, -1))
+    if new:
+        changes.append((new, 1))
+    return await _write(db, changes)
+
+
+async def apply_balances(db, transactions: list, sign: int = 1) -> Dict[int, float]:
+    """Add (or with sign=-1 remove) many transactions; the new balance of each account moved"""
+    return await _write(db, [(transaction, sign) for transaction in transactions])
+
+
+def _completed_delta() -> dict:
+    return {"$cond": [{"$eq": ["$type", "income"]}, "$amount", {"$multiply": ["$amount", -1]}]}
+
+
+async def ledger_totals(db, account_ids: Optional[List[int]] = None) -> Dict[int, float]:
+    """Net completed amount per account, summed from the ledger"""
+    match = {"status": "completed"}
+    if account_ids is not None:
+        match["accountId"] = {"$in": account_ids}
+    rows = await db.transactions.aggregate([
+        {"$match": match},
+        {"$group": {"_id": "$accountId", "total": {"$sum": _completed_delta()}}}
+    ]).to_list(None)
+    return {row["_id"]: row["total"] for row in rows}
+
+
+async def rebuild_balance_days(db):
+    """
+    Regenerate account_balance_days from the ledger.
+    Like the rollup rebuild, $out swaps the collection in atomically; writes
+    that land while it runs may be missed, so run it during quiet periods.
+    """
+    await db.transactions.aggregate([
+        {"$match": {"status": "completed"}},
+        {
+            "$group": {
+                "_id": {"accountId": "$accountId", "date": "$date"},
+                "delta": {"$sum": _completed_delta()},
+                "count": {"$sum": 1}
+            }
+        },
+        {"$project": {"_id": 0, "accountId": "$_id.accountId", "date": "$_id.date", "delta": 1, "count": 1}},
+        {"$out": BALANCE_DAYS_COLLECTION}
+    ]).to_list(None)
+
+
+async def migrate_opening_balances(db) -> int:
+    """
+    Give accounts from before ledger-maintained balances an openingBalance.
+    Their hand-entered balance is taken as current, so the opening balance is
+    whatever makes the ledger add up to it. Returns how many accounts changed.
+    """
+    accounts = await db.accounts.find(
+        {"openingBalance": {"$exists": False}}, {"_id": 0, "id": 1, "balance": 1}
+    ).to_list(None)
+    if not accounts:
+        return 0
+    totals = await ledger_totals(db, [account["id"] for account in accounts])
+    await db.accounts.bulk_write([
+        UpdateOne(
+            {"id": account["id"], "openingBalance": {"$exists": False}},
+            {"$set": {"openingBalance": round(account.get("balance", 0) - totals.get(account["id"], 0), 2)}}
+        )
+        for account in accounts
+    ], ordered=False)
+    return len(accounts)
+
+
+async def ensure_balances(db):
+    """Migrate existing accounts and build the daily changes once for databases that predate them"""
+    await migrate_opening_balances(db)
+    if await db[BALANCE_DAYS_COLLECTION].estimated_document_count() == 0 \
+            and await db.transactions.estimated_document_count() > 0:
+        await rebuild_balance_days(db)
+
+
+async def _reconcile_days(db, fix: bool) -> Tuple[Dict[int, int], int]:
+    # Compares each stored day with the ledger's and repairs only the days that differ, each
+    # on the condition that it hasn't changed since it was read (stored days are read first,
+    # so a transaction written meanwhile makes its day's repair a no-op rather than lost).
+    # No $out: day deltas written while a reconcile runs on live traffic must survive it
+    days = db[BALANCE_DAYS_COLLECTION].find({}, {"_id": 0, "accountId": 1, "date": 1, "delta": 1, "count": 1})
+    stored = {(day["accountId"], day["date"]): (day["delta"], day["count"]) async for day in days}
+    rows = await db.transactions.aggregate([
+        {"$match": {"status": "completed"}},
+        {"$group": {"_id": {"accountId": "$accountId", "date": "$date"},
+                    "delta": {"$sum": _completed_delta()}, "count": {"$sum": 1}}}
+    ]).to_list(None)
+    expected = {(row["_id"]["accountId"], row["_id"]["date"]): (row["delta"], row["count"]) for row in rows}
+
+    drifted: Dict[int, int] = {}
+    operations = []
+    for key in stored.keys() | expected.keys():
+        (have_delta, have_count), (delta, count) = stored.get(key, (0, 0)), expected.get(key, (0, 0))
+        if abs(have_delta - delta) < DRIFT_TOLERANCE and have_count == count:
+            continue
+        account_id, day = key
+        drifted[account_id] = drifted.get(account_id, 0) + 1
+        if key not in stored:
+            # Created here unless a transaction write upserted it meanwhile
+            operations.append(UpdateOne({"accountId": account_id, "date": day},
+                                        {"$setOnInsert": {"delta": delta, "count": count}}, upsert=True))
+            continue
+        unchanged = {"accountId": account_id, "date": day, "delta": have_delta, "count": have_count}
+        if key in expected:
+            operations.append(UpdateOne(unchanged, {"$set": {"delta": delta, "count": count}}))
+        else:
+            operations.append(DeleteOne(unchanged))
+    if not (fix and operations):
+        return drifted, 0
+    result = await db[BALANCE_DAYS_COLLECTION].bulk_write(operations, ordered=False)
+    return drifted, result.modified_count + result.deleted_count + result.upserted_count
+
+
+async def reconcile_balances(db, fix: bool = True) -> dict:
+    """
+    Recompute every balance and daily change from the ledger and report drift.
+    With `fix`, a drifted balance is reset and drifted days are rewritten,
+    each unless it changed while being checked.
+    """
+    accounts = await db.accounts.find(
+        {}, {"_id": 0, "id": 1, "name": 1, "balance": 1, "openingBalance": 1}
+    ).to_list(None)
+    totals = await ledger_totals(db)
+    day_drift, days_corrected = await _reconcile_days(db, fix)
+    report = {"accounts": [], "drifted": 0, "corrected": 0,
+              "daysDrifted": sum(day_drift.values()), "daysCorrected": days_corrected}
+    for account in accounts:
+        expected = round(account.get("openingBalance", 0) + totals.get(account["id"], 0), 2)
+        drift = round(account.get("balance", 0) - expected, 2)
+        entry = {"id": account["id"], "name": account["name"], "balance": account.get("balance"),
+                 "expected": expected, "drift": drift, "daysDrifted": day_drift.get(account["id"], 0)}
+        if abs(drift) >= DRIFT_TOLERANCE:
+            report["drifted"] += 1
+            if fix:
+                result = await db.accounts.update_one(
+                    {"id": account["id"], "balance": account.get("balance")}, {"$set": {"balance": expected}}
+                )
+                entry["corrected"] = result.modified_count == 1
+                report["corrected"] += result.modified_count
+        report["accounts"].append(entry)
+    return report
+
+
+async def balances_at(db, as_of: str) -> List[dict]:
+    """Every account's balance at the end of `as_of` (YYYY-MM-DD)"""
+    accounts = await db.accounts.find({}, {"_id": 0, "id": 1, "name": 1, "openingBalance": 1}).to_list(None)
+    rows = await db[BALANCE_DAYS_COLLECTION].aggregate([
+        {"$match": {"date": {"$lte": as_of}}},
+        {"$group": {"_id": "$accountId", "total": {"$sum": "$delta"}}}
+    ]).to_list(None)
+    totals = {row["_id"]: row["total"] for row in rows}
+    return [
+        {
+            "accountId": account["id"],
+            "name": account["name"],
+            "balance": round(account.get("openingBalance", 0) + totals.get(account["id"], 0), 2)
+        }
+        for account in accounts
+    ]
+
+
+async def balance_history(db, account: dict, date_from: str, date_to: str) -> dict:
+    """
+    End-of-day balances of one account for every day from `date_from` to
+    `date_to`. Raises ValueError for impossible dates or oversized ranges.
+    """
+    first, last = date.fromisoformat(date_from), date.fromisoformat(date_to)
+    days = (last - first).days + 1
+    if days < 1:
+        raise ValueError("'from' must not be after 'to'")
+    if days > MAX_HISTORY_DAYS:
+        raise ValueError(f"Range spans more than {MAX_HISTORY_DAYS} days")
+
+    days_collection = db[BALANCE_DAYS_COLLECTION]
+    before = await days_collection.aggregate([
+        {"$match": {"accountId": account["id"], "date": {"$lt": date_from}}},
+        {"$group": {"_id": None, "total": {"$sum": "$delta"}}}
+    ]).to_list(1)
+    changes = await days_collection.find(
+        {"accountId": account["id"], "date": {"$gte": date_from, "$lte": date_to}},
+        {"_id": 0, "date": 1, "delta": 1}
+    ).to_list(None)
+    by_day = {change["date"]: change["delta"] for change in changes}
+
+    balance = account.get("openingBalance", 0) + (before[0]["total"] if before else 0)
+    points = []
+    for offset in range(days):
+        day = (first + timedelta(days=offset)).isoformat()
+        balance += by_day.get(day, 0)
+        points.append({"date": day, "balance": round(balance, 2)})
+    return {
+        "accountId": account["id"],
+        "name": account["name"],
+        "openingBalance": account.get("openingBalance", 0),
+        "from": date_from,
+        "to": date_to,
+        "points": points
+    }
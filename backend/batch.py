@@ -0,0 +1,153 @@
+"""
+Batch create/update/delete for the entity collections
+Each operation is validated and checked against the stored documents up
+front, then the whole batch is written with one bulk_write. Results come
+back one per operation, in request order. Ordered batches stop at the first
+failure and report the rest as skipped; unordered batches attempt them all.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from ledger_io import describe_error
+
+MAX_BATCH_SIZE = 5000
+
+OPERATIONS = ["create", "update", "delete"]
+
+
+class BatchOperation(BaseModel):
+    op: str  # 'create', 'update' or 'delete'
+    id: Optional[int] = None  # required for update/delete
+    data: Optional[Dict[str, Any]] = None  # required for create/update
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+    ordered: bool = True
+
+
+class _Plan:
+    """Walks the batch in order, tracking what each document will look like once earlier operations apply"""
+
+    def __init__(self, current: dict, model, key: str, prepare, new_ids, updater=None):
+        self.current = current
+        self.model = model
+        self.key = key
+        self.prepare = prepare
+        self.new_ids = new_ids
+        self.updater = updater
+
+    def _document(self, operation: BatchOperation, old: Optional[dict] = None) -> dict:
+        if operation.data is None:
+            raise ValueError("data is required")
+        document = self.model(**operation.data).dict()
+        if operation.op == "update":
+            document[self.key] = operation.id
+        elif self.new_ids is not None:
+            document[self.key] = next(self.new_ids)
+        return self.prepare(document, old) if self.prepare else document
+
+    def _existing(self, operation: BatchOperation) -> dict:
+        if operation.id is None:
+            raise ValueError("id is required")
+        old = self.current.get(operation.id)
+        if old is None:
+            raise ValueError(f"{self.key} {operation.id} not found")
+        return old
+
+    def step(self, operation: BatchOperation):
+        """The write for one operation plus the document before and after it"""
+        if operation.op == "create":
+            new = self._document(operation)
+            self.current[new[self.key]] = new
+            # bulk_write adds _id to inserted documents; keep the tracked copy clean
+            return InsertOne(dict(new)), None, new
+        if operation.op == "update":
+            old = self._existing(operation)
+            update = self._document(operation, old)
+            new = {**old, **update}
+            self.current[operation.id] = new
+            write = self.updater(update) if self.updater else {"$set": update}
+            return UpdateOne({self.key: operation.id}, write), old, new
+        if operation.op == "delete":
+            old = self._existing(operation)
+            del self.current[operation.id]
+            return DeleteOne({self.key: operation.id}), old, None
+        raise ValueError(f"op must be one of: {', '.join(OPERATIONS)}")
+
+
+async def execute_batch(
+    db,
+    collection: str,
+    request: BatchRequest,
+    model,
+    key: str = "id",
+    allocator=None,
+    prepare: Optional[Callable[[dict, Optional[dict]], dict]] = None,
+    updater: Optional[Callable[[dict], Any]] = None
+) -> Tuple[dict, List[Tuple[Optional[dict], Optional[dict]]]]:
+    """
+    Run a batch against `collection`. Returns the response body and the
+    (old, new) document pairs that were written, for the caller's side effects
+    (cache invalidation, rollups, rename propagation). `prepare` receives each
+    validated document and the current one it updates (None for creates).
+    `updater` turns an update's prepared fields into the update document
+    (default {"$set": fields}), e.g. a pipeline for fields derived atomically.
+    """
+    operations = request.operations
+    referenced = list({operation.id for operation in operations if operation.op != "create" and operation.id is not None})
+    current = {}
+    if referenced:
+        async for doc in db[collection].find({key: {"$in": referenced}}, {"_id": 0}):
+            current[doc[key]] = doc
+
+    # One counter round trip for every create in the batch
+    creates = sum(1 for operation in operations if operation.op == "create")
+    new_ids = iter(await allocator.allocate(db, collection, creates)) if allocator and creates else None
+    plan = _Plan(current, model, key, prepare, new_ids, updater)
+
+    results: List[Optional[dict]] = [None] * len(operations)
+    writes, planned = [], []
+    stopped = False
+    for index, operation in enumerate(operations):
+        if stopped:
+            results[index] = {"index": index, "status": "skipped"}
+            continue
+        try:
+            write, old, new = plan.step(operation)
+        except (ValueError, TypeError, ValidationError) as e:
+            results[index] = {"index": index, "status": "error", "error": describe_error(e)}
+            stopped = request.ordered
+            continue
+        writes.append(write)
+        planned.append((index, old, new))
+
+    write_errors = {}
+    if writes:
+        try:
+            await db[collection].bulk_write(writes, ordered=request.ordered)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                message = "Already exists" if error.get("code") == 11000 else error.get("errmsg", "Write failed")
+                write_errors[error["index"]] = message
+    # An ordered bulk_write stops at its first error
+    first_error = min(write_errors) if request.ordered and write_errors else None
+
+    applied = []
+    for position, (index, old, new) in enumerate(planned):
+        if position in write_errors:
+            results[index] = {"index": index, "status": "error", "error": write_errors[position]}
+        elif first_error is not None and position > first_error:
+            results[index] = {"index": index, "status": "skipped"}
+        else:
+            results[index] = {"index": index, "status": "ok", "id": (new or old)[key]}
+            applied.append((old, new))
+
+    counts = {"succeeded": 0, "failed": 0, "skipped": 0}
+    for result in results:
+        counts[{"ok": "succeeded", "error": "failed", "skipped": "skipped"}[result["status"]]] += 1
+    return {"results": results, **counts}, applied
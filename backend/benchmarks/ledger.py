@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Synthetic ledger generator for benchmarks
+Scales the shapes in seed_data.py up to any number of transactions: the
+seeded categories, accounts and budgets, client/vendor lists grown with the
+ledger, and transactions spread over several years with per-category amounts
+modelled on the seed rows. Output is deterministic for a given --seed.
+
+Usage (from backend/): python benchmarks/ledger.py --transactions 1000000 [--db moneyflow_bench]
+The target database is dropped and rebuilt, so it defaults to a dedicated one.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterator, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+
+from balances import ensure_balances  # noqa: E402
+from changes import CHANGES_COLLECTION, ensure_feed  # noqa: E402
+from database import create_mongo_client  # noqa: E402
+from ids import sync_counters  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+from rollups import rebuild_rollups  # noqa: E402
+from search import TERMS_FIELD, search_terms  # noqa: E402
+from seed_data import (  # noqa: E402
+    accounts_data, budgets_data, categories_data, clients_data, transactions_data, vendors_data
+)
+from versions import bump_versions  # noqa: E402
+
+BENCH_DB = "moneyflow_bench"
+INSERT_CHUNK_SIZE = 10_000
+
+# One client and one vendor per this many transactions, on top of the seeded ones
+TRANSACTIONS_PER_PARTY = 5_000
+
+STATUS_WEIGHTS = {"completed": 85, "pending": 10, "overdue": 5}
+
+
+def _parties(seeded: List[dict], count: int, kind: str) -> List[dict]:
+    parties = [dict(party) for party in seeded]
+    for party_id in range(len(seeded) + 1, count + 1):
+        party = dict(seeded[party_id % len(seeded)])
+        party.update(id=party_id, name=f"{kind} {party_id}", email=f"{kind.lower()}{party_id}@example.com")
+        parties.append(party)
+    return parties
+
+
+def reference_data(transactions: int) -> dict:
+    parties = max(len(clients_data), transactions // TRANSACTIONS_PER_PARTY)
+    return {
+        "categories": [dict(category) for category in categories_data],
+        "accounts": [dict(account) for account in accounts_data],
+        "clients": _parties(clients_data, parties, "Client"),
+        "vendors": _parties(vendors_data, parties, "Vendor"),
+        "budgets": [dict(budget) for budget in budgets_data],
+    }
+
+
+def generate_transactions(count: int, reference: dict, years: int = 3, seed: int = 42) -> Iterator[dict]:
+    """Yield `count` transactions with ids 1..count, shaped as the API writes them"""
+    rng = random.Random(seed)
+    categories = reference["categories"]
+    accounts = reference["accounts"]
+    clients, vendors = reference["clients"], reference["vendors"]
+
+    # Typical amount and notes per category, taken from the seed transactions
+    amounts, notes = {}, {}
+    for row in transactions_data:
+        amounts.setdefault(row["categoryId"], []).append(float(row["amount"]))
+        notes.setdefault(row["categoryId"], []).append(row["notes"])
+    all_notes = [row["notes"] for row in transactions_data]
+
+    statuses, weights = zip(*STATUS_WEIGHTS.items())
+    end = date.today()
+    days = 365 * years
+    # Expenses are far more frequent than income in a real ledger
+    category_weights = [1 if category["type"] == "income" else 4 for category in categories]
+
+    for transaction_id in range(1, count + 1):
+        category = rng.choices(categories, category_weights)[0]
+        account = rng.choice(accounts)
+        base = rng.choice(amounts.get(category["id"], [100.0]))
+        party = None
+        if rng.random() < 0.6:
+            party = rng.choice(clients if category["type"] == "income" else vendors)
+        transaction = {
+            "id": transaction_id,
+            "date": (end - timedelta(days=rng.randrange(days))).isoformat(),
+            "type": category["type"],
+            "amount": round(base * rng.uniform(0.5, 1.5), 2),
+            "categoryId": category["id"],
+            "categoryName": category["name"],
+            "accountId": account["id"],
+            "accountName": account["name"],
+            "clientVendorId": party["id"] if party else None,
+            "clientVendorName": party["name"] if party else "",
+            "status": rng.choices(statuses, weights)[0],
+            "notes": rng.choice(notes.get(category["id"], all_notes)),
+            "recurring": rng.random() < 0.1,
+        }
+        transaction[TERMS_FIELD] = search_terms(transaction)
+        yield transaction
+
+
+async def generate_ledger(db, transactions: int, years: int = 3, seed: int = 42, progress: bool = False,
+                         capped_feed: bool = True):
+    """
+    Replace the ledger in `db` with a synthetic one, then build indexes, counters, rollups and balances.
+    The change feed is recreated empty; `capped_feed=False` leaves it to be created on first write,
+    for mongomock, which can't create capped collections.
+    """
+    reference = reference_data(transactions)
+    for name in ["categories", "accounts", "clients", "vendors", "budgets", "transactions",
+                 "counters", "rollups", "propagation_jobs", "account_balance_days", "alerts"]:
+        await db[name].delete_many({})
+    # Capped collections can't be emptied with delete_many (before MongoDB 7.0), and it has to
+    # exist, capped, before ensure_indexes would create it as a plain collection
+    await db[CHANGES_COLLECTION].drop()
+    if capped_feed:
+        await ensure_feed(db)
+    for name, documents in reference.items():
+        await db[name].insert_many(documents)
+
+    started, chunk = time.perf_counter(), []
+    for transaction in generate_transactions(transactions, reference, years, seed):
+        chunk.append(transaction)
+        if len(chunk) >= INSERT_CHUNK_SIZE:
+            await db.transactions.insert_many(chunk, ordered=False)
+            chunk = []
+            if progress:
+                done = transaction["id"]
+                print(f"  {done:>10,} transactions ({done / (time.perf_counter() - started):,.0f}/s)", end="\r")
+    if chunk:
+        await db.transactions.insert_many(chunk, ordered=False)
+    if progress:
+        print()
+
+    await ensure_indexes(db)
+    await sync_counters(db)
+    await rebuild_rollups(db)
+    await ensure_balances(db)
+    await bump_versions(db, list(reference) + ["transactions"])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--transactions", type=int, default=100_000)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", default=BENCH_DB, help=f"database to (re)build, default {BENCH_DB}")
+    args = parser.parse_args()
+
+    client = create_mongo_client()
+    try:
+        print(f"🧪 Generating {args.transactions:,} transactions into '{args.db}'...")
+        started = time.perf_counter()
+        await generate_ledger(client[args.db], args.transactions, args.years, args.seed, progress=True)
+        print(f"✅ Done in {time.perf_counter() - started:.1f}s")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
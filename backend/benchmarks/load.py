@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Concurrent load scenarios for the API
+Runs each scenario with N concurrent clients and reports p50/p95/p99 latency
+and throughput. Requests go to the app in-process (no HTTP server needed) or,
+with --url, to a running server. Results can be saved as a named baseline in
+baselines.json and later checked against it to catch regressions.
+
+Usage (from backend/):
+  python benchmarks/load.py --transactions 100000            # local mongod, builds moneyflow_bench first
+  python benchmarks/load.py                                  # reuse an existing moneyflow_bench ledger
+  python benchmarks/load.py --mongomock --transactions 10000 # in-memory stand-in, no mongod
+  python benchmarks/load.py ... --baseline mongod-100k --save # record a baseline
+  python benchmarks/load.py ... --baseline mongod-100k        # compare; exits 1 on regression
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+sys.path.insert(0, str(BENCH_DIR))
+
+from ledger import BENCH_DB, generate_ledger, reference_data  # noqa: E402
+
+BASELINES_FILE = BENCH_DIR / "baselines.json"
+
+# Allowed drift before --baseline reports a regression
+DEFAULT_TOLERANCE = 0.25
+
+SEARCH_WORDS = ["salary", "rent", "grocery", "internet", "gas", "netflix", "doctor", "movie", "consult", "dividend"]
+
+Request = Tuple[str, str, dict]
+
+
+def _random_month(rng: random.Random) -> Tuple[str, str]:
+    today = date.today()
+    months_back = rng.randrange(36)
+    year, month = divmod(today.year * 12 + today.month - 1 - months_back, 12)
+    first = date(year, month + 1, 1)
+    last = date(year + (month + 1) // 12, (month + 1) % 12 + 1, 1).toordinal() - 1
+    return first.isoformat(), date.fromordinal(last).isoformat()
+
+
+def build_scenarios(
+    reference: dict, search_mode: str, batch_size: int = 500
+) -> Dict[str, Callable[[random.Random], Request]]:
+    account_ids = [account["id"] for account in reference["accounts"]]
+    expense_categories = [category for category in reference["categories"] if category["type"] == "expense"]
+
+    def list_page(rng):
+        return "GET", "/api/transactions", {"params": {"limit": 100}}
+
+    def list_filtered(rng):
+        first, last = _random_month(rng)
+        return "GET", "/api/transactions", {"params": {
+            "limit": 100, "accountId": rng.choice(account_ids), "from": first, "to": last
+        }}
+
+    def search(rng):
+        return "GET", "/api/transactions", {"params": {
+            "limit": 50, "search": rng.choice(SEARCH_WORDS), "searchMode": search_mode
+        }}
+
+    def kpis(rng):
+        first, last = _random_month(rng)
+        return "GET", "/api/dashboard/kpis", {"params": {"from": first, "to": last}}
+
+    def budgets(rng):
+        return "GET", "/api/budgets", {"params": {"month": _random_month(rng)[0][:7]}}
+
+    def bulk_insert(rng):
+        operations = []
+        for _ in range(batch_size):
+            category = rng.choice(expense_categories)
+            operations.append({"op": "create", "data": {
+                "date": date.today().isoformat(), "type": "expense",
+                "amount": round(rng.uniform(5, 500), 2), "categoryId": category["id"],
+                "accountId": rng.choice(account_ids), "notes": "load test"
+            }})
+        return "POST", "/api/transactions/batch", {"json": {"ordered": False, "operations": operations}}
+
+    return {
+        "list": list_page,
+        "list_filtered": list_filtered,
+        "search": search,
+        "kpis": kpis,
+        "budgets": budgets,
+        "bulk_insert": bulk_insert,
+    }
+
+
+# mongomock has no $lookup sub-pipelines (budgets) and no $text (search uses prefix mode instead)
+MONGOMOCK_UNSUPPORTED = {"budgets"}
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values), max(1, math.ceil(fraction * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+async def run_scenario(client, make_request, requests: int, concurrency: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    planned = [make_request(rng) for _ in range(requests)]
+    latencies, errors = [], 0
+    position = 0
+
+    async def worker():
+        nonlocal position, errors
+        while position < len(planned):
+            method, path, options = planned[position]
+            position += 1
+            started = time.perf_counter()
+            response = await client.request(method, path, **options)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "throughput_rps": round(requests / elapsed, 1),
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        if result["p95_ms"] > expected["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']}ms vs baseline {expected['p95_ms']}ms")
+        if result["throughput_rps"] < expected["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['throughput_rps']} req/s vs baseline {expected['throughput_rps']} req/s")
+        if result["errors"] > expected.get("errors", 0):
+            regressions.append(f"{name}: {result['errors']} errors vs baseline {expected.get('errors', 0)}")
+    return regressions
+
+
+async def open_client(args):
+    """An httpx client bound to the app in-process, or to --url"""
+    import httpx
+
+    if args.url:
+        return httpx.AsyncClient(base_url=args.url, timeout=60)
+
+    import server
+    from database import create_mongo_client
+
+    # ASGITransport doesn't run the app's lifespan, so the database is attached here
+    if args.mongomock:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("--mongomock needs the mongomock-motor package (pip install mongomock-motor)")
+        server.db = AsyncMongoMockClient()[args.db]
+    else:
+        server.db = create_mongo_client()[args.db]
+    if args.transactions:
+        print(f"🧪 Generating {args.transactions:,} transactions into '{args.db}'...")
+        await generate_ledger(server.db, args.transactions, capped_feed=not args.mongomock)
+    elif args.mongomock:
+        sys.exit("--mongomock starts from an empty database; pass --transactions")
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://bench", timeout=60)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--transactions", type=int, help="generate a ledger of this size first")
+    parser.add_argument("--db", default=BENCH_DB)
+    parser.add_argument("--mongomock", action="store_true", help="run in-process against mongomock-motor")
+    parser.add_argument("--url", help="target a running server instead, e.g. http://localhost:8001")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=500, help="creates per bulk_insert request")
+    parser.add_argument("--scenarios", nargs="+", help="subset to run (default: all supported)")
+    parser.add_argument("--baseline", help="baseline name in baselines.json to compare against (or --save to)")
+    parser.add_argument("--save", action="store_true", help="store the results as --baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    if args.save and not args.baseline:
+        parser.error("--save needs --baseline NAME")
+    if args.url and (args.mongomock or args.transactions):
+        parser.error("--url targets an existing server; generate its ledger with benchmarks/ledger.py")
+
+    client = await open_client(args)
+    # The reference ids come from the generator's shapes, whatever the ledger size
+    search_mode = "prefix" if args.mongomock else "text"
+    scenarios = build_scenarios(reference_data(args.transactions or 0), search_mode, args.batch_size)
+    names = args.scenarios or [name for name in scenarios if not (args.mongomock and name in MONGOMOCK_UNSUPPORTED)]
+    unknown = set(names) - set(scenarios)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = {}
+    print(f"{'scenario':<14} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'errors':>7}")
+    async with client:
+        for offset, name in enumerate(names):
+            result = await run_scenario(client, scenarios[name], args.requests, args.concurrency, args.seed + offset)
+            results[name] = result
+            print(f"{name:<14} {result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9} "
+                  f"{result['throughput_rps']:>9} {result['errors']:>7}")
+
+    if not args.baseline:
+        return
+    baselines = json.loads(BASELINES_FILE.read_text()) if BASELINES_FILE.exists() else {}
+    if args.save:
+        baselines[args.baseline] = {
+            "transactions": args.transactions,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "batchSize": args.batch_size,
+            "target": "url" if args.url else ("mongomock" if args.mongomock else "mongod"),
+            "scenarios": results,
+        }
+        BASELINES_FILE.write_text(json.dumps(baselines, indent=2) + "\n")
+        print(f"💾 Saved baseline '{args.baseline}'")
+        return
+    if args.baseline not in baselines:
+        sys.exit(f"No baseline named '{args.baseline}' in {BASELINES_FILE.name}")
+    regressions = compare(results, baselines[args.baseline]["scenarios"], args.tolerance)
+    if regressions:
+        print(f"❌ Regressions against '{args.baseline}' (tolerance {args.tolerance:.0%}):")
+        for regression in regressions:
+            print(f"   {regression}")
+        sys.exit(1)
+    print(f"✅ Within {args.tolerance:.0%} of baseline '{args.baseline}'")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
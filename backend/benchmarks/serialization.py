@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Per-row cost of serializing a transaction list response
+Compares the two paths GET /api/transactions can take:
+- models: Transaction(**doc) per row in the handler, FastAPI re-validating
+  the list against response_model, then stdlib json (FAST_RESPONSES=0)
+- fast:   the projected Mongo documents encoded directly by ORJSONResponse
+
+Usage (from backend/): python benchmarks/serialization.py [--rows 10000 100000 1000000]
+No database is needed; rows are synthesized from the seed transactions.
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+# server.py and seed_data.py read these at import time; nothing connects here
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.responses import ORJSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from seed_data import transactions_data  # noqa: E402
+from server import Transaction  # noqa: E402
+
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+
+
+def make_rows(count: int) -> List[dict]:
+    """`count` documents shaped like the listing projection returns them"""
+    rows = []
+    for index in range(count):
+        row = dict(transactions_data[index % len(transactions_data)])
+        row["id"] = index + 1
+        row["amount"] = float(row["amount"]) + index % 100
+        rows.append(row)
+    return rows
+
+
+def models_path(rows: List[dict]) -> bytes:
+    # What FastAPI does for response_model=List[Transaction] (see fastapi.routing.serialize_response)
+    adapter = TypeAdapter(List[Transaction])
+    models = [Transaction(**row) for row in rows]
+    content = adapter.validate_python([model.model_dump() for model in models])
+    data = adapter.dump_python(content, mode="json")
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(rows: List[dict]) -> bytes:
+    return ORJSONResponse(rows).body
+
+
+def measure(function, rows: List[dict], repeat: int) -> float:
+    """Best-of-`repeat` wall time in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function(rows)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'models µs/row':>14} {'fast µs/row':>12} {'speedup':>8} {'body MB':>8}")
+    for count in args.rows:
+        rows = make_rows(count)
+        if json.loads(models_path(rows[:100])) != json.loads(fast_path(rows[:100])):
+            sys.exit("The two paths disagree on the response body")
+        # A single pass at 1M rows already takes several seconds
+        repeat = 1 if count >= 1_000_000 else args.repeat
+        slow = measure(models_path, rows, repeat)
+        fast = measure(fast_path, rows, repeat)
+        size = len(fast_path(rows)) / 1_000_000
+        print(f"{count:>10} {slow / count * 1e6:>14.2f} {fast / count * 1e6:>12.2f} {slow / fast:>7.1f}x {size:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
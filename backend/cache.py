@@ -0,0 +1,157 @@
+"""
+In-process cache for reference data (categories, accounts, clients, vendors)
+These collections are small and read on every transaction write and list
+request. Entries expire after a TTL and the cache is size-bounded (LRU).
+The write handlers invalidate their own worker's entries directly; on a
+replica set a change stream invalidates every worker's cache as well.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_COLLECTIONS = ["categories", "accounts", "clients", "vendors"]
+
+# Cache namespaces derived from each collection; "parties" resolves a
+# clientVendorId against clients and vendors together
+DEPENDENT_NAMESPACES = {
+    "categories": {"categories"},
+    "accounts": {"accounts"},
+    "clients": {"clients", "parties"},
+    "vendors": {"vendors", "parties"},
+}
+
+# Key used for a whole-collection snapshot
+ALL = "*"
+
+
+class TTLCache:
+    """LRU cache whose entries also expire `ttl` seconds after being stored"""
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()  # key -> (stored at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, max_age: Optional[float] = None) -> Tuple[bool, Any]:
+        """(found, value); `max_age` treats entries stored longer ago than that as misses too"""
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and now - entry[0] > self.ttl:
+            del self._entries[key]
+            entry = None
+        if entry is None or (max_age is not None and now - entry[0] > max_age):
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self, predicate: Callable[[Hashable], bool]):
+        for key in [key for key in self._entries if predicate(key)]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ReferenceCache:
+    def __init__(self, maxsize: int = 4096, ttl: float = 60.0):
+        self._cache = TTLCache(maxsize, ttl)
+        # Bumped on invalidation so a load that raced with a write isn't cached
+        self._generations: Dict[str, int] = {}
+        self.invalidations = 0
+        self.change_stream = "inactive"
+
+    async def lookup(self, namespace: str, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                     max_age: Optional[float] = None) -> Any:
+        """
+        Return the cached value, loading (and caching) it on a miss. None is
+        never cached: an entity just created through another worker must be
+        found on the next lookup. Callers that copy names into new documents
+        pass a short `max_age`, since other workers' renames only reach this
+        cache through the TTL on a standalone server.
+        """
+        found, value = self._cache.get((namespace, key), max_age)
+        if found:
+            return value
+        generation = self._generations.get(namespace, 0)
+        value = await loader()
+        if value is not None and self._generations.get(namespace, 0) == generation:
+            self._cache.set((namespace, key), value)
+        return value
+
+    def invalidate(self, collection: str):
+        """Drop every entry derived from `collection`"""
+        namespaces = DEPENDENT_NAMESPACES.get(collection, {collection})
+        for namespace in namespaces:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+        self._cache.discard(lambda key: key[0] in namespaces)
+        self.invalidations += 1
+
+    def clear(self):
+        for namespace in self._generations:
+            self._generations[namespace] += 1
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._cache.hits + self._cache.misses
+        return {
+            "hits": self._cache.hits,
+            "misses": self._cache.misses,
+            "hitRatio": round(self._cache.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self._cache.evictions,
+            "invalidations": self.invalidations,
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "ttl": self._cache.ttl,
+            "changeStream": self.change_stream,
+        }
+
+    async def watch(self, db):
+        """
+        Invalidate on every change to a reference collection, whichever worker
+        (or tool) made it. Change streams need a replica set; on a standalone
+        server this returns and the TTL bounds how stale other workers can be.
+        """
+        pipeline = [{"$match": {"ns.coll": {"$in": REFERENCE_COLLECTIONS}}}]
+        while True:
+            try:
+                async with db.watch(pipeline) as stream:
+                    self.change_stream = "active"
+                    # Anything cached before the stream opened may already be stale
+                    self.clear()
+                    async for change in stream:
+                        self.invalidate(change["ns"]["coll"])
+            except OperationFailure as e:
+                # 40573: "The $changeStream stage is only supported on replica sets"
+                self.change_stream = "unavailable"
+                logger.info(f"Reference cache change stream unavailable, relying on TTL: {e}")
+                return
+            except asyncio.CancelledError:
+                self.change_stream = "inactive"
+                raise
+            except PyMongoError as e:
+                self.change_stream = "reconnecting"
+                logger.warning(f"Reference cache change stream interrupted: {e}")
+                self.clear()
+                await asyncio.sleep(5)
@@ -0,0 +1,262 @@
+"""
+Change feed for Server-Sent Events clients
+The write handlers record what they changed as compact events in a capped
+`change_events` collection: the whole document for a create, only the changed
+fields for an update and just the id for a delete. Each event gets a sequence
+number from the counters collection, which doubles as the SSE event id.
+Numbers are reserved before the events are inserted, so concurrent writers
+can land them slightly out of order (11 before 10); readers therefore look
+back a window of numbers below the highest they have seen and drop repeats,
+rather than assuming everything below it has already arrived.
+
+Every worker tails the collection and fans events out to its own streams,
+so a client sees writes made through any worker. A reconnecting client sends
+the last sequence number it saw (Last-Event-ID) and is replayed what it
+missed, or told to reload if the capped collection no longer reaches back
+that far.
+
+  {seq, collection, op: "create", id, data: document}
+  {seq, collection, op: "update", id, data: changed fields}
+  {seq, collection, op: "delete", id}
+  {seq, collection, op: "reset"}    reload the whole collection
+"""
+
+import asyncio
+import logging
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterable, List, Optional, Set, Tuple
+
+import orjson
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, OperationFailure, PyMongoError
+
+from ids import reserve_ids
+
+logger = logging.getLogger(__name__)
+
+CHANGES_COLLECTION = "change_events"
+
+# Fields that are internal to the server and never sent to clients
+INTERNAL_FIELDS = {"_id", "searchTerms"}
+
+# Writes touching more documents than this record a single reset instead of one event each
+MAX_EVENTS_PER_WRITE = 1000
+
+# Longest replay for a reconnecting client; further behind, it is told to reset
+MAX_REPLAY = 10000
+
+# How far below the highest sequence number an event can still arrive; readers look back this far
+REORDER_WINDOW = 100
+
+# Pause before re-opening the tailable cursor once it has died (e.g. while the collection is empty)
+RETRY_SECONDS = 1.0
+
+HEARTBEAT_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+def feed_size() -> int:
+    """Capped collection size (CHANGE_FEED_SIZE_MB, default 16); older events are overwritten,
+    which bounds how far back a client can resume"""
+    return int(os.environ.get("CHANGE_FEED_SIZE_MB", "16")) * 1024 * 1024
+
+
+def _public(document: dict) -> dict:
+    return {field: value for field, value in document.items() if field not in INTERNAL_FIELDS}
+
+
+def diff_events(collection: str, changes: Iterable[Tuple[Optional[dict], Optional[dict]]], key: str = "id") -> List[dict]:
+    """Events for (old, new) document pairs; either side may be None, and updates that change nothing are dropped"""
+    events = []
+    for old, new in changes:
+        if old is None and new is not None:
+            events.append({"collection": collection, "op": "create", "id": new[key], "data": _public(new)})
+        elif new is None and old is not None:
+            events.append({"collection": collection, "op": "delete", "id": old[key]})
+        elif old is not None:
+            data = {field: value for field, value in _public(new).items() if old.get(field) != value}
+            if data:
+                events.append({"collection": collection, "op": "update", "id": new[key], "data": data})
+    return events
+
+
+def update_event(collection: str, entity_id, fields: dict) -> dict:
+    return {"collection": collection, "op": "update", "id": entity_id, "data": fields}
+
+
+def reset_event(collection: str) -> dict:
+    return {"collection": collection, "op": "reset"}
+
+
+async def ensure_feed(db):
+    """
+    Create the capped collection if it doesn't exist yet, or convert it if it was
+    created as a plain one (e.g. by an index build or a write before this ran):
+    tailable cursors are rejected on anything but a capped collection
+    """
+    if not await db.list_collection_names(filter={"name": CHANGES_COLLECTION}):
+        try:
+            await db.create_collection(CHANGES_COLLECTION, capped=True, size=feed_size())
+            return
+        except CollectionInvalid:
+            pass  # another worker created it first
+    if (await db[CHANGES_COLLECTION].options()).get("capped"):
+        return
+    logger.warning(f"{CHANGES_COLLECTION} is not capped; converting it")
+    try:
+        await db.command("convertToCapped", CHANGES_COLLECTION, size=feed_size())
+    except OperationFailure:
+        # Another worker may have converted it meanwhile
+        if not (await db[CHANGES_COLLECTION].options()).get("capped"):
+            raise
+
+
+def _sse(event: dict) -> bytes:
+    return f"id: {event['seq']}\nevent: change\ndata: ".encode() + orjson.dumps(event) + b"\n\n"
+
+
+class _SeenSeqs:
+    """Sequence numbers already handled, remembered for REORDER_WINDOW below the highest"""
+
+    def __init__(self, highest: int = 0):
+        self.highest = highest
+        self._seen: Set[int] = set()
+
+    @property
+    def floor(self) -> int:
+        # Events at or below this are taken as delivered (or lost for good)
+        return self.highest - REORDER_WINDOW
+
+    def add(self, seq: int) -> bool:
+        """Whether `seq` is new, marking it seen"""
+        if seq <= self.floor or seq in self._seen:
+            return False
+        self._seen.add(seq)
+        if seq > self.highest:
+            self.highest = seq
+            if len(self._seen) > 2 * REORDER_WINDOW:
+                self._seen = {seen for seen in self._seen if seen > self.floor}
+        return True
+
+
+class ChangeFeed:
+    def __init__(self):
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    async def record(self, db, events: List[dict]):
+        """Append events to the feed; writes with very many events collapse to one reset per collection"""
+        if len(events) > MAX_EVENTS_PER_WRITE:
+            events = [reset_event(collection) for collection in dict.fromkeys(event["collection"] for event in events)]
+        if not events:
+            return
+        first = await reserve_ids(db, CHANGES_COLLECTION, len(events))
+        now = datetime.now(timezone.utc)
+        await db[CHANGES_COLLECTION].insert_many(
+            [{**event, "seq": first + offset, "ts": now} for offset, event in enumerate(events)],
+            ordered=True
+        )
+
+    async def latest_seq(self, db) -> int:
+        last = await db[CHANGES_COLLECTION].find_one({}, {"seq": 1}, sort=[("seq", -1)])
+        return last["seq"] if last else 0
+
+    async def run(self, db):
+        """Tail the feed and hand each event to this worker's streams"""
+        seen = _SeenSeqs(await self.latest_seq(db))
+        # Events already in the feed predate this worker; only the ones inserted from now on are sent
+        async for event in db[CHANGES_COLLECTION].find({"seq": {"$gt": seen.floor}}, {"_id": 0, "seq": 1}):
+            seen.add(event["seq"])
+        while True:
+            try:
+                # A tailable cursor dies when it finds the collection empty or is overtaken by
+                # the capped collection's overwrites; it is re-opened after RETRY_SECONDS (the
+                # collection must be capped, which ensure_feed sees to at startup). Re-opening
+                # looks back from the floor, so events inserted late aren't skipped
+                cursor = db[CHANGES_COLLECTION].find(
+                    {"seq": {"$gt": seen.floor}}, {"_id": 0, "ts": 0}, cursor_type=CursorType.TAILABLE_AWAIT
+                )
+                while True:
+                    async for event in cursor:
+                        if seen.add(event["seq"]):
+                            self._publish(event)
+                    if not cursor.alive:
+                        break
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                logger.warning(f"Change feed cursor interrupted: {e}")
+            await asyncio.sleep(RETRY_SECONDS)
+
+    def _publish(self, event: dict):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # The stream ends; the client reconnects with Last-Event-ID and is replayed from the feed
+                self._subscribers.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    @contextmanager
+    def subscribe(self):
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+
+    async def _catch_up(self, db, after: int) -> Optional[List[dict]]:
+        # None when the events after `after` are no longer all in the feed (or never were).
+        # The replay starts REORDER_WINDOW below `after`: events numbered just below it may
+        # have been inserted after it. The client may see some of those twice
+        changes = db[CHANGES_COLLECTION]
+        oldest = await changes.find_one({}, {"seq": 1}, sort=[("seq", 1)])
+        latest = await self.latest_seq(db)
+        if after > latest or (oldest and after < oldest["seq"] - 1) or latest - after > MAX_REPLAY:
+            return None
+        return await changes.find(
+            {"seq": {"$gt": after - REORDER_WINDOW}}, {"_id": 0, "ts": 0}
+        ).sort("seq", 1).to_list(None)
+
+    async def event_stream(self, db, last_event_id: Optional[int] = None,
+                           heartbeat: float = HEARTBEAT_SECONDS) -> AsyncIterator[bytes]:
+        """
+        text/event-stream body. A fresh connection starts with a `ready` event
+        carrying the current position; a resumed one is replayed the events it
+        missed, or sent a `reset` event if it is too far behind. `change`
+        events follow as they are recorded. Every event is sent once per
+        connection, in the order it reached the feed.
+        """
+        with self.subscribe() as queue:
+            seen = None
+            if last_event_id is not None:
+                missed = await self._catch_up(db, last_event_id)
+                if missed is None:
+                    latest = await self.latest_seq(db)
+                    seen = _SeenSeqs(latest)
+                    yield f"retry: 3000\nid: {latest}\nevent: reset\ndata: {{\"seq\":{latest}}}\n\n".encode()
+                else:
+                    seen = _SeenSeqs(last_event_id)
+                    yield b"retry: 3000\n\n"
+                    for event in missed:
+                        if seen.add(event["seq"]):
+                            yield _sse(event)
+            if seen is None:
+                latest = await self.latest_seq(db)
+                seen = _SeenSeqs(latest)
+                yield f"retry: 3000\nid: {latest}\nevent: ready\ndata: {{\"seq\":{latest}}}\n\n".encode()
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if event is None:
+                    return
+                # Already replayed, or too far before the client's position
+                if seen.add(event["seq"]):
+                    yield _sse(event)
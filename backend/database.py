@@ -0,0 +1,52 @@
+"""
+MongoDB client configuration
+One place that turns the environment into AsyncIOMotorClient options, shared
+by the API server and the command-line scripts. Each uvicorn worker owns one
+client (and so one pool per server), so MONGO_MAX_POOL_SIZE times the number
+of workers bounds the connections a deployment can open.
+
+  MONGO_MAX_POOL_SIZE          connections per server per process (default 100)
+  MONGO_MIN_POOL_SIZE          connections kept open even when idle (default 0)
+  MONGO_MAX_IDLE_TIME_MS       close pooled connections idle for longer than this
+  MONGO_WAIT_QUEUE_TIMEOUT_MS  fail a request that waits this long for a free connection
+  MONGO_COMPRESSORS            e.g. "zstd,snappy" (needs the zstandard / python-snappy packages)
+  MONGO_READ_PREFERENCE        primary (default), primaryPreferred, secondary, ...
+
+Options already given in MONGO_URL's query string take precedence over these.
+"""
+
+import os
+from typing import Iterable
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.uri_parser import parse_uri
+
+# Environment variable -> client keyword, and how to parse its value
+ENV_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": ("maxPoolSize", int),
+    "MONGO_MIN_POOL_SIZE": ("minPoolSize", int),
+    "MONGO_MAX_IDLE_TIME_MS": ("maxIdleTimeMS", int),
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": ("waitQueueTimeoutMS", int),
+    "MONGO_COMPRESSORS": ("compressors", str),
+    "MONGO_READ_PREFERENCE": ("readPreference", str),
+}
+
+
+def client_options() -> dict:
+    """Client keyword arguments from the environment, minus any the URL already sets"""
+    url_options = {name.lower() for name in parse_uri(os.environ["MONGO_URL"], validate=False)["options"]}
+    options = {}
+    for variable, (keyword, parse) in ENV_OPTIONS.items():
+        value = os.environ.get(variable)
+        if value and keyword.lower() not in url_options:
+            options[keyword] = parse(value)
+    return options
+
+
+def database_name() -> str:
+    return os.environ["DB_NAME"]
+
+
+def create_mongo_client(event_listeners: Iterable = ()) -> AsyncIOMotorClient:
+    """A client for MONGO_URL with the pool settings from the environment; connects lazily"""
+    return AsyncIOMotorClient(os.environ["MONGO_URL"], event_listeners=list(event_listeners), **client_options())
@@ -0,0 +1,68 @@
+"""
+Transaction date normalization
+Dates are stored as ISO "YYYY-MM-DD" strings. In that form they sort
+chronologically as plain strings, so range filters, the (date, id) cursor
+index and the monthly rollup key (the first seven characters) all work on
+the stored field directly.
+"""
+
+import logging
+import re
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def normalize_date(value) -> str:
+    """ISO "YYYY-MM-DD" for a date, datetime or ISO-8601 date/datetime string"""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    text = str(value).strip()
+    try:
+        return date.fromisoformat(text).isoformat()
+    except ValueError:
+        pass
+    try:
+        # Timestamps keep their local calendar date rather than being shifted to UTC
+        return datetime.fromisoformat(text).date().isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+def is_month_aligned(from_date: Optional[str], to_date: Optional[str]) -> bool:
+    """Whether a range covers whole months, so month rollups can answer it"""
+    # Raises ValueError for impossible dates such as 2024-02-30
+    if from_date and date.fromisoformat(from_date).day != 1:
+        return False
+    if to_date:
+        next_day = date.fromisoformat(to_date) + timedelta(days=1)
+        return next_day.day == 1
+    return True
+
+
+async def normalize_stored_dates(db, batch_size: int = 1000) -> int:
+    """Rewrite transaction dates stored in any other format; returns how many changed"""
+    cursor = db.transactions.find({"date": {"$not": ISO_DATE}}, {"_id": 1, "date": 1}).batch_size(batch_size)
+    operations, changed = [], 0
+    async for doc in cursor:
+        try:
+            normalized = normalize_date(doc["date"])
+        except ValueError:
+            logger.warning(f"Transaction {doc['_id']} has an unparseable date: {doc['date']!r}")
+            continue
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"date": normalized}}))
+        if len(operations) >= batch_size:
+            await db.transactions.bulk_write(operations, ordered=False)
+            changed += len(operations)
+            operations = []
+    if operations:
+        await db.transactions.bulk_write(operations, ordered=False)
+        changed += len(operations)
+    return changed
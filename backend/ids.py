@@ -0,0 +1,76 @@
+"""
+Integer id allocation for MongoDB collections
+Ids come from a `counters` collection advanced with an atomic $inc, so
+concurrent inserts never read-then-increment the same maximum id
+"""
+
+import asyncio
+from typing import Dict, List, Tuple
+
+from pymongo import ReturnDocument
+
+COUNTERS_COLLECTION = "counters"
+
+# Collections whose documents carry an allocated integer `id`
+ID_COLLECTIONS = ["categories", "accounts", "transactions", "clients", "vendors"]
+
+
+async def reserve_ids(db, collection: str, count: int = 1) -> int:
+    """Atomically reserve `count` consecutive ids and return the first one"""
+    counter = await db[COUNTERS_COLLECTION].find_one_and_update(
+        {"_id": collection},
+        {"$inc": {"seq": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return counter["seq"] - count + 1
+
+
+async def sync_counter(db, collection: str):
+    """Raise the counter to the highest id already stored (e.g. after seeding)"""
+    last = await db[collection].find_one({}, {"id": 1}, sort=[("id", -1)])
+    if last and "id" in last:
+        await db[COUNTERS_COLLECTION].update_one(
+            {"_id": collection},
+            {"$max": {"seq": last["id"]}},
+            upsert=True
+        )
+
+
+async def sync_counters(db):
+    for collection in ID_COLLECTIONS:
+        await sync_counter(db, collection)
+
+
+class IdAllocator:
+    """
+    Hands out ids from blocks reserved in the counters collection.
+    With block_size=1 every id costs one counter round trip; larger blocks
+    serve ids from memory and only touch MongoDB when a block runs out.
+    Unused ids in a block are lost on restart, which leaves gaps but never
+    duplicates, and ids are unique but only roughly ordered across workers.
+    """
+
+    def __init__(self, block_size: int = 1):
+        self.block_size = max(1, block_size)
+        self._blocks: Dict[str, Tuple[int, int]] = {}  # collection -> (next, end)
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def allocate(self, db, collection: str, count: int = 1) -> List[int]:
+        lock = self._locks.setdefault(collection, asyncio.Lock())
+        async with lock:
+            ids = []
+            next_id, end = self._blocks.get(collection, (0, 0))
+            while len(ids) < count:
+                if next_id >= end:
+                    size = max(self.block_size, count - len(ids))
+                    next_id = await reserve_ids(db, collection, size)
+                    end = next_id + size
+                take = min(end - next_id, count - len(ids))
+                ids.extend(range(next_id, next_id + take))
+                next_id += take
+            self._blocks[collection] = (next_id, end)
+            return ids
+
+    async def next_id(self, db, collection: str) -> int:
+        return (await self.allocate(db, collection, 1))[0]
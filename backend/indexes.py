@@ -0,0 +1,159 @@
+"""
+Index management for the tracker's MongoDB collections
+Each index mirrors the filter/sort shape of a handler in server.py; they are
+created idempotently at startup and compared against the live database by
+the health endpoint
+"""
+
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "transactions": [
+        # Single-row lookups by id in the update/delete handlers
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Default listing order and the (date, id) keyset cursor
+        IndexModel([("date", DESCENDING), ("id", DESCENDING)], name="date_id"),
+        # Listing filtered by status/type, KPI and chart aggregations
+        IndexModel([("status", ASCENDING), ("type", ASCENDING), ("date", DESCENDING)], name="status_type_date"),
+        # $text search with field weights (search mode "text")
+        IndexModel(
+            [("categoryName", TEXT), ("notes", TEXT), ("clientVendorName", TEXT)],
+            name="text_search",
+            weights={"categoryName": 3, "clientVendorName": 3, "notes": 1}
+        ),
+        # Multikey index answering anchored prefix regexes (search mode "prefix")
+        IndexModel([("searchTerms", ASCENDING)], name="searchTerms"),
+        # Budget spend per category and month
+        IndexModel(
+            [("categoryId", ASCENDING), ("type", ASCENDING), ("status", ASCENDING), ("date", DESCENDING)],
+            name="category_type_status_date"
+        ),
+        # Listing filtered by account, category or client/vendor, newest first (and date ranges within them)
+        IndexModel([("accountId", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)], name="accountId_date_id"),
+        IndexModel([("categoryId", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)], name="categoryId_date_id"),
+        IndexModel([("clientVendorId", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)], name="clientVendorId_date_id"),
+        # Id-ordered batches of one entity's transactions for rename propagation
+        IndexModel([("categoryId", ASCENDING), ("id", ASCENDING)], name="categoryId_id"),
+        IndexModel([("accountId", ASCENDING), ("id", ASCENDING)], name="accountId_id"),
+        IndexModel([("clientVendorId", ASCENDING), ("id", ASCENDING)], name="clientVendorId_id"),
+    ],
+    "categories": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("type", ASCENDING)], name="type"),
+    ],
+    "accounts": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("type", ASCENDING)], name="type"),
+    ],
+    "clients": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "vendors": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "rollups": [
+        # One document per rollup key; the $inc upserts match on all five fields
+        IndexModel(
+            [("month", ASCENDING), ("categoryId", ASCENDING), ("accountId", ASCENDING),
+             ("type", ASCENDING), ("status", ASCENDING)],
+            name="rollup_key_unique", unique=True
+        ),
+        # Budget spend lookups by category
+        IndexModel([("categoryId", ASCENDING), ("month", ASCENDING)], name="categoryId_month"),
+    ],
+    "account_balance_days": [
+        # One document per account and day; the $inc upserts match on both, and
+        # history/point-in-time reads scan one account's days in date order
+        IndexModel([("accountId", ASCENDING), ("date", ASCENDING)], name="accountId_date_unique", unique=True),
+        # Balances of every account as of a date
+        IndexModel([("date", ASCENDING)], name="date"),
+    ],
+    "budgets": [
+        # Budgets are addressed by category, one budget per category
+        IndexModel([("categoryId", ASCENDING)], name="categoryId_unique", unique=True),
+    ],
+    "alerts": [
+        # At most one active alert per account or budget-month, even with several workers evaluating
+        IndexModel(
+            [("kind", ASCENDING), ("accountId", ASCENDING), ("categoryId", ASCENDING), ("month", ASCENDING)],
+            name="active_key_unique", unique=True, partialFilterExpression={"status": "active"}
+        ),
+        # Listing by status, most recently changed first
+        IndexModel([("status", ASCENDING), ("updatedAt", DESCENDING)], name="status_updatedAt"),
+    ],
+    "change_events": [
+        # Replay from a client's Last-Event-ID and the feed's oldest/newest positions
+        # (sequence numbers come from the counters collection, so they are unique already)
+        IndexModel([("seq", ASCENDING)], name="seq"),
+    ],
+    "propagation_jobs": [
+        # Unfinished jobs for an entity are superseded by a newer rename
+        IndexModel([("collection", ASCENDING), ("entityId", ASCENDING), ("status", ASCENDING)], name="entity_status"),
+        # Resuming unfinished jobs at startup and listing recent ones
+        IndexModel([("status", ASCENDING), ("createdAt", ASCENDING)], name="status_createdAt"),
+        IndexModel([("createdAt", DESCENDING)], name="createdAt"),
+    ],
+}
+
+# Build state from the last ensure_indexes() run: "collection.name" -> status
+build_status: Dict[str, str] = {}
+
+
+def _key(spec) -> tuple:
+    pairs = tuple((field, direction if isinstance(direction, str) else int(direction)) for field, direction in spec)
+    if any(direction == "text" for _, direction in pairs):
+        # MongoDB reports every text index under the same internal key, and a
+        # collection can only have one, so compare them by that key
+        return (("_fts", "text"), ("_ftsx", 1))
+    return pairs
+
+
+async def ensure_indexes(db):
+    """Create any missing index; existing indexes with the same key are left alone"""
+    for collection, models in INDEXES.items():
+        try:
+            existing = {_key(info["key"]) for info in (await db[collection].index_information()).values()}
+        except PyMongoError as e:
+            existing = set()
+            logger.warning(f"Could not list indexes on {collection}: {e}")
+
+        for model in models:
+            spec = model.document
+            label = f"{collection}.{spec['name']}"
+            if _key(spec["key"].items()) in existing:
+                build_status[label] = "ready"
+                continue
+
+            build_status[label] = "building"
+            try:
+                await db[collection].create_indexes([model])
+                build_status[label] = "ready"
+                logger.info(f"Created index {label}")
+            except PyMongoError as e:
+                # e.g. duplicate ids left over from before the unique index existed
+                build_status[label] = f"failed: {e}"
+                logger.error(f"Could not create index {label}: {e}")
+
+
+async def index_report(db) -> dict:
+    """Compare the expected indexes against what the database actually has"""
+    missing = []
+    for collection, models in INDEXES.items():
+        info = await db[collection].index_information()
+        existing = {_key(index["key"]) for index in info.values()}
+        for model in models:
+            spec = model.document
+            if _key(spec["key"].items()) not in existing:
+                missing.append(f"{collection}.{spec['name']}")
+
+    return {
+        "status": "ok" if not missing else "degraded",
+        "missing": missing,
+        "build": dict(build_status)
+    }
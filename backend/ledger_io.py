@@ -0,0 +1,306 @@
+"""
+Bulk transaction import and export
+Imports read an uploaded CSV or NDJSON file one chunk at a time, resolve
+names against in-memory maps built once per import, and write with
+unordered insert_many so a bad row never stops the rest of the file.
+Exports stream straight from the Motor cursor, one batch at a time.
+"""
+
+import asyncio
+import csv
+import io
+import json
+from itertools import islice
+from typing import Iterator, Tuple
+
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from balances import apply_balances
+from rollups import apply_transactions
+from search import TERMS_FIELD, search_terms
+
+IMPORT_CHUNK_SIZE = 1000
+EXPORT_BATCH_SIZE = 5000
+
+# Cap the per-row report so a badly formatted 500k-row file can't produce a huge response
+MAX_REPORTED_ERRORS = 1000
+
+
+class ReferenceMaps:
+    """Category, account and client/vendor lookups by id and by (case-insensitive) name"""
+
+    def __init__(self, categories, accounts, clients, vendors):
+        self.categories = self._index(categories)
+        self.accounts = self._index(accounts)
+        # Clients win over vendors with the same id, as in create_transaction
+        self.parties = self._index(vendors)
+        for key, doc in self._index(clients).items():
+            self.parties[key] = doc
+
+    @staticmethod
+    def _index(docs) -> dict:
+        index = {}
+        for doc in docs:
+            index[doc["id"]] = doc
+            index[doc["name"].strip().lower()] = doc
+        return index
+
+    @staticmethod
+    def _resolve(index: dict, row: dict, id_field: str, name_fields: list, label: str):
+        ref = row.pop(id_field, None)
+        names = [row.pop(field, None) for field in name_fields]
+        if ref is not None:
+            try:
+                doc = index.get(int(ref))
+            except (TypeError, ValueError):
+                raise ValueError(f"{id_field} must be an integer")
+            if doc is None:
+                raise ValueError(f"{label} {ref} not found")
+            return doc
+        name = next((name for name in names if name), None)
+        if name is None:
+            return None
+        doc = index.get(str(name).strip().lower())
+        if doc is None:
+            raise ValueError(f"{label} '{name}' not found")
+        return doc
+
+    def resolve(self, row: dict) -> Tuple[dict, dict, dict]:
+        category = self._resolve(self.categories, row, "categoryId", ["category", "categoryName"], "Category")
+        account = self._resolve(self.accounts, row, "accountId", ["account", "accountName"], "Account")
+        party = self._resolve(self.parties, row, "clientVendorId", ["clientVendor", "clientVendorName"], "Client/vendor")
+        if category is None:
+            raise ValueError("Category is required")
+        if account is None:
+            raise ValueError("Account is required")
+        return category, account, party
+
+    def names(self, transaction: dict) -> dict:
+        """Denormalized names for a transaction's category, account and client/vendor ids"""
+        category = self.categories.get(transaction["categoryId"])
+        account = self.accounts.get(transaction["accountId"])
+        if category is None:
+            raise ValueError("Category not found")
+        if account is None:
+            raise ValueError("Account not found")
+        party = self.parties.get(transaction["clientVendorId"]) if transaction.get("clientVendorId") else None
+        return {
+            "categoryName": category["name"],
+            "accountName": account["name"],
+            "clientVendorName": party["name"] if party else ""
+        }
+
+
+async def load_reference_maps(db) -> ReferenceMaps:
+    projection = {"_id": 0, "id": 1, "name": 1}
+    return ReferenceMaps(
+        await db.categories.find({}, projection).to_list(None),
+        await db.accounts.find({}, projection).to_list(None),
+        await db.clients.find({}, projection).to_list(None),
+        await db.vendors.find({}, projection).to_list(None),
+    )
+
+
+def read_rows(file, fmt: str) -> Iterator[Tuple[int, dict]]:
+    """Yield (row number, raw row) pairs without loading the whole file"""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    if fmt == "ndjson":
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                row = e
+            yield number, row
+    else:
+        # Row numbers count the header as row 1, matching what spreadsheets show
+        for number, row in enumerate(csv.DictReader(text), start=2):
+            yield number, row
+
+
+def build_transaction(raw, maps: ReferenceMaps, model) -> dict:
+    if isinstance(raw, Exception):
+        raise ValueError(f"Invalid JSON: {raw}")
+    if not isinstance(raw, dict):
+        raise ValueError("Row must be an object")
+
+    # Blank CSV cells fall back to the model defaults
+    row = {key.strip(): value for key, value in raw.items()
+           if key and value is not None and value != ""}
+    category, account, party = maps.resolve(row)
+    row["categoryId"] = category["id"]
+    row["accountId"] = account["id"]
+    row["clientVendorId"] = party["id"] if party else None
+
+    transaction = model(**row).dict()
+    transaction["categoryName"] = category["name"]
+    transaction["accountName"] = account["name"]
+    transaction["clientVendorName"] = party["name"] if party else ""
+    transaction[TERMS_FIELD] = search_terms(transaction)
+    return transaction
+
+
+def describe_error(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+
+async def import_transactions(db, rows: Iterator[Tuple[int, dict]], model, allocator) -> dict:
+    maps = await load_reference_maps(db)
+    report = {"imported": 0, "failed": 0, "errors": []}
+
+    def fail(number: int, message: str):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": number, "error": message})
+
+    while True:
+        chunk = list(islice(rows, IMPORT_CHUNK_SIZE))
+        if not chunk:
+            break
+
+        documents, numbers = [], []
+        for number, raw in chunk:
+            try:
+                documents.append(build_transaction(raw, maps, model))
+                numbers.append(number)
+            except (ValueError, TypeError, ValidationError) as e:
+                fail(number, describe_error(e))
+        if not documents:
+            continue
+
+        # One counter round trip per chunk (or none while the allocator's block lasts)
+        for document, new_id in zip(documents, await allocator.allocate(db, "transactions", len(documents))):
+            document["id"] = new_id
+
+        failed_indexes = set()
+        try:
+            await db.transactions.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                failed_indexes.add(error["index"])
+                fail(numbers[error["index"]], error.get("errmsg", "Write failed"))
+
+        inserted = [doc for index, doc in enumerate(documents) if index not in failed_indexes]
+        await apply_transactions(db, inserted)
+        await apply_balances(db, inserted)
+        report["imported"] += len(inserted)
+
+    report["errors"].sort(key=lambda error: error["row"])
+    return report
+
+
+# === EXPORT ===
+
+EXPORT_FIELDS = [
+    "id", "date", "type", "amount", "categoryId", "categoryName", "accountId", "accountName",
+    "clientVendorId", "clientVendorName", "status", "notes", "recurring"
+]
+
+
+async def _batches(cursor, size: int = EXPORT_BATCH_SIZE):
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _csv_chunk(rows: list, header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+async def export_csv(cursor):
+    """CSV text, one chunk per cursor batch; memory is bounded by the batch size"""
+    header = True
+    async for batch in _batches(cursor):
+        yield _csv_chunk(batch, header)
+        header = False
+    if header:
+        # Empty result: still send the header row
+        yield _csv_chunk([], True)
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to the caller"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def export_parquet(cursor):
+    """
+    Parquet file, one row group per cursor batch. Encoding runs in a worker
+    thread so the event loop keeps serving requests during large exports.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()), ("date", pa.string()), ("type", pa.string()), ("amount", pa.float64()),
+        ("categoryId", pa.int64()), ("categoryName", pa.string()),
+        ("accountId", pa.int64()), ("accountName", pa.string()),
+        ("clientVendorId", pa.int64()), ("clientVendorName", pa.string()),
+        ("status", pa.string()), ("notes", pa.string()), ("recurring", pa.bool_()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+
+    def write(rows: list) -> bytes:
+        columns = {field: [row.get(field) for row in rows] for field in EXPORT_FIELDS}
+        writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+        return sink.drain()
+
+    def close() -> bytes:
+        writer.close()
+        return sink.drain()
+
+    closed = False
+    try:
+        async for batch in _batches(cursor):
+            yield await asyncio.to_thread(write, batch)
+        footer = await asyncio.to_thread(close)
+        closed = True
+        yield footer
+    finally:
+        if not closed:
+            # Client went away mid-export: release the writer without sending anything
+            writer.close()
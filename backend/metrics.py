@@ -0,0 +1,379 @@
+"""
+Request metrics and slow-request profiling
+Per-route latency and response-size histograms, MongoDB command counts and
+durations (overall and per request), rendered in the Prometheus text format
+for GET /metrics. Mongo commands are attributed to the request that issued
+them through a context variable: Motor copies the caller's context into the
+executor thread that runs the command, where the CommandListener fires.
+Metrics are kept per worker process; scrape each worker.
+
+The opt-in profiler samples the event-loop thread's stack while requests
+are in flight and writes folded stacks (flamegraph.pl / speedscope input)
+for requests slower than a threshold.
+"""
+
+import contextvars
+import itertools
+import logging
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COMMAND_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+# Requests that match no route share one label, so scanners can't create unbounded series
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple, object] = {}
+        # Mongo listener callbacks run on executor threads
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._samples(labels, value))
+        return lines
+
+    def _samples(self, labels: Tuple, value) -> List[str]:
+        return [f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"]
+
+
+class CounterMetric(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class GaugeMetric(Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class HistogramMetric(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (), buckets: Tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value: float):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                state = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][position] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self, labels: Tuple, state) -> List[str]:
+        counts, total, count = state
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            bucket_labels = _labels(self.label_names, labels, f'le="{_number(bound)}"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        plain = _labels(self.label_names, labels)
+        infinity = _labels(self.label_names, labels, 'le="+Inf"')
+        lines.append(f"{self.name}_bucket{infinity} {count}")
+        lines.append(f"{self.name}_sum{plain} {_number(total)}")
+        lines.append(f"{self.name}_count{plain} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.register(CounterMetric(
+    "http_requests_total", "HTTP requests by route, method and status", ("method", "route", "status")))
+REQUEST_SECONDS = registry.register(HistogramMetric(
+    "http_request_duration_seconds", "Time from request start to the last response byte", ("method", "route")))
+RESPONSE_BYTES = registry.register(HistogramMetric(
+    "http_response_size_bytes", "Response body size", ("method", "route"), SIZE_BUCKETS))
+IN_FLIGHT = registry.register(GaugeMetric(
+    "http_requests_in_flight", "Requests currently being handled"))
+REQUEST_MONGO_COMMANDS = registry.register(HistogramMetric(
+    "http_request_mongo_commands", "MongoDB commands issued per request", ("method", "route"), COMMAND_COUNT_BUCKETS))
+REQUEST_MONGO_SECONDS = registry.register(HistogramMetric(
+    "http_request_mongo_seconds", "Total MongoDB command time per request", ("method", "route")))
+MONGO_COMMANDS = registry.register(CounterMetric(
+    "mongo_commands_total", "MongoDB commands by command name and outcome", ("command", "outcome")))
+MONGO_SECONDS = registry.register(HistogramMetric(
+    "mongo_command_duration_seconds", "MongoDB command round-trip time", ("command",)))
+POOL_CONNECTIONS = registry.register(GaugeMetric(
+    "mongo_pool_connections", "Pooled connections by state (open, in_use)", ("address", "state")))
+POOL_MAX_SIZE = registry.register(GaugeMetric(
+    "mongo_pool_max_size", "maxPoolSize of each server's pool", ("address",)))
+POOL_WAITING = registry.register(GaugeMetric(
+    "mongo_pool_waiting", "Operations waiting to check out a connection", ("address",)))
+POOL_CHECKOUT_FAILURES = registry.register(CounterMetric(
+    "mongo_pool_checkout_failures_total", "Failed connection check-outs by reason (e.g. timeout)", ("address", "reason")))
+
+
+class RequestStats:
+    """Mongo work done on behalf of one request"""
+
+    __slots__ = ("commands", "mongo_seconds", "_lock")
+
+    def __init__(self):
+        self.commands = 0
+        self.mongo_seconds = 0.0
+        # Concurrent queries of one request (asyncio.gather) finish on different threads
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.commands += 1
+            self.mongo_seconds += seconds
+
+
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Pass to AsyncIOMotorClient(event_listeners=[...])"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, "ok")
+
+    def failed(self, event):
+        self._record(event, "error")
+
+    def _record(self, event, outcome: str):
+        seconds = event.duration_micros / 1_000_000
+        MONGO_COMMANDS.inc(event.command_name, outcome)
+        MONGO_SECONDS.observe(event.command_name, value=seconds)
+        stats = current_request.get()
+        if stats is not None:
+            stats.add(seconds)
+
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """
+    Connection pool gauges; pass to AsyncIOMotorClient(event_listeners=[...]).
+    in_use close to mongo_pool_max_size, or a non-zero waiting gauge, means the
+    pool is saturated and requests queue for connections.
+    """
+
+    def pool_created(self, event):
+        POOL_MAX_SIZE.set(_address(event), value=event.options.get("maxPoolSize", 100))
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        POOL_CONNECTIONS.inc(_address(event), "open")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        POOL_CONNECTIONS.dec(_address(event), "open")
+
+    def connection_check_out_started(self, event):
+        POOL_WAITING.inc(_address(event))
+
+    def connection_check_out_failed(self, event):
+        POOL_WAITING.dec(_address(event))
+        POOL_CHECKOUT_FAILURES.inc(_address(event), event.reason)
+
+    def connection_checked_out(self, event):
+        POOL_WAITING.dec(_address(event))
+        POOL_CONNECTIONS.inc(_address(event), "in_use")
+
+    def connection_checked_in(self, event):
+        POOL_CONNECTIONS.dec(_address(event), "in_use")
+
+
+class SlowRequestProfiler:
+    """
+    Samples the event-loop thread every `interval` seconds while requests are
+    in flight. A request slower than `threshold` seconds gets its samples
+    written as folded stacks. One loop runs every request, so the samples
+    cover whatever it executed during the request, other requests included;
+    that is what shows event-loop contention.
+    """
+
+    def __init__(self, threshold: float, interval: float = 0.005, directory: Path = Path("profiles")):
+        self.threshold = threshold
+        self.interval = interval
+        self.directory = Path(directory)
+        self._thread_id: Optional[int] = None
+        self._active: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+        # Keeps file names unique when similar requests finish in the same second
+        self._sequence = itertools.count(1)
+
+    def begin(self) -> Counter:
+        if self._sampler is None:
+            self._thread_id = threading.get_ident()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._sampler = threading.Thread(target=self._sample_forever, name="request-profiler", daemon=True)
+            self._sampler.start()
+        samples = Counter()
+        with self._lock:
+            self._active[id(samples)] = samples
+        return samples
+
+    def end(self, samples: Counter, method: str, route: str, seconds: float):
+        with self._lock:
+            self._active.pop(id(samples), None)
+        if seconds < self.threshold or not samples:
+            return
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        path = self.directory / (
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{next(self._sequence)}-{method}-{slug}-{int(seconds * 1000)}ms.folded"
+        )
+        path.write_text("".join(f"{stack} {count}\n" for stack, count in samples.most_common()))
+        logger.info(f"Slow request {method} {route} took {seconds * 1000:.0f}ms; profile written to {path}")
+
+    def _sample_forever(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                targets = list(self._active.values())
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack = _fold(frame)
+            with self._lock:
+                for samples in targets:
+                    samples[stack] += 1
+
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{Path(code.co_filename).stem}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class MetricsMiddleware:
+    """ASGI middleware; counts the body as it is sent, so streamed responses are measured too"""
+
+    def __init__(self, app, profiler: Optional[SlowRequestProfiler] = None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        samples = self.profiler.begin() if self.profiler else None
+        IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            seconds = time.perf_counter() - started
+            IN_FLIGHT.dec()
+            current_request.reset(token)
+            # FastAPI puts the matched route in the scope; its template keeps the label set bounded
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            REQUESTS.inc(method, route, str(status))
+            REQUEST_SECONDS.observe(method, route, value=seconds)
+            RESPONSE_BYTES.observe(method, route, value=size)
+            REQUEST_MONGO_COMMANDS.observe(method, route, value=stats.commands)
+            REQUEST_MONGO_SECONDS.observe(method, route, value=stats.mongo_seconds)
+            if samples is not None:
+                self.profiler.end(samples, method, route, seconds)
@@ -0,0 +1,163 @@
+"""
+Background propagation of renamed reference data
+Transactions keep denormalized copies of categoryName, accountName and
+clientVendorName. Renaming a category, account, client or vendor records a
+job in `propagation_jobs` and returns straight away; a worker task rewrites
+the affected transactions in id-ordered batches, saving its position after
+each batch so a restarted server resumes where the last one stopped.
+Each batch is reported through the `changed` callback as `transactions`
+update events carrying the new name, for the change feed and list versions.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, List, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+
+from changes import update_event
+from search import TERMS_FIELD, TEXT_FIELDS, search_terms
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "propagation_jobs"
+BATCH_SIZE = 1000
+
+# A running job whose worker hasn't saved progress for this long is presumed dead
+STALE_AFTER = timedelta(minutes=2)
+
+# Renamed collection -> (transaction reference field, transaction name field)
+TARGETS = {
+    "categories": ("categoryId", "categoryName"),
+    "accounts": ("accountId", "accountName"),
+    "clients": ("clientVendorId", "clientVendorName"),
+    "vendors": ("clientVendorId", "clientVendorName"),
+}
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class PropagationWorker:
+    def __init__(self, batch_size: int = BATCH_SIZE, changed: Optional[Callable[[List[dict]], Awaitable]] = None):
+        self.batch_size = batch_size
+        self.changed = changed
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    async def enqueue(self, db, collection: str, entity_id: int, name: str):
+        """Record a rename and hand it to the worker; returns the job id"""
+        now = _now()
+        # The new job covers every transaction, so unfinished jobs for the same entity are obsolete
+        await db[JOBS_COLLECTION].update_many(
+            {"collection": collection, "entityId": entity_id, "status": {"$in": ["pending", "running", "failed"]}},
+            {"$set": {"status": "superseded", "updatedAt": now}}
+        )
+        result = await db[JOBS_COLLECTION].insert_one({
+            "collection": collection,
+            "entityId": entity_id,
+            "name": name,
+            "status": "pending",
+            "lastId": 0,
+            "updated": 0,
+            "batches": 0,
+            "createdAt": now,
+            "updatedAt": now,
+        })
+        self._queue.put_nowait(result.inserted_id)
+        return result.inserted_id
+
+    async def resume(self, db):
+        """Queue jobs left unfinished by a previous run"""
+        cursor = db[JOBS_COLLECTION].find(
+            {"status": {"$in": ["pending", "running", "failed"]}}, {"_id": 1}
+        ).sort("createdAt", 1)
+        async for job in cursor:
+            self._queue.put_nowait(job["_id"])
+
+    async def run(self, db):
+        await self.resume(db)
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._process(db, job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Left as "failed" with its position saved; the next startup retries it
+                logger.exception(f"Propagation job {job_id} failed")
+                await db[JOBS_COLLECTION].update_one(
+                    {"_id": job_id, "status": "running"},
+                    {"$set": {"status": "failed", "error": str(e), "updatedAt": _now()}}
+                )
+            finally:
+                self._queue.task_done()
+
+    async def _claim(self, db, job_id):
+        now = _now()
+        return await db[JOBS_COLLECTION].find_one_and_update(
+            {
+                "_id": job_id,
+                "$or": [
+                    {"status": {"$in": ["pending", "failed"]}},
+                    {"status": "running", "updatedAt": {"$lt": now - STALE_AFTER}},
+                ]
+            },
+            {"$set": {"status": "running", "updatedAt": now}, "$unset": {"error": ""}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _process(self, db, job_id):
+        # Another worker may own the job, or a newer rename may have superseded it
+        job = await self._claim(db, job_id)
+        if job is None:
+            return
+
+        entity_id, name = job["entityId"], job["name"]
+        id_field, name_field = TARGETS[job["collection"]]
+        if job["collection"] == "vendors" and await db.clients.find_one({"id": entity_id}, {"_id": 1}):
+            # Transactions show the client's name when a client and vendor share an id
+            await self._finish(db, job_id)
+            return
+
+        projection = {"_id": 1, "id": 1, **{field: 1 for field in TEXT_FIELDS}}
+        last_id = job["lastId"]
+        while True:
+            batch = await db.transactions.find(
+                {id_field: entity_id, "id": {"$gt": last_id}}, projection
+            ).sort("id", 1).limit(self.batch_size).to_list(None)
+            if not batch:
+                break
+
+            # searchTerms include the names, so they're recomputed alongside them
+            operations = []
+            for doc in batch:
+                doc[name_field] = name
+                operations.append(UpdateOne(
+                    {"_id": doc["_id"], id_field: entity_id},
+                    {"$set": {name_field: name, TERMS_FIELD: search_terms(doc)}}
+                ))
+            result = await db.transactions.bulk_write(operations, ordered=False)
+            last_id = batch[-1]["id"]
+            if self.changed:
+                # Before progress is saved, so a retried batch is reported again rather than never
+                await self.changed([update_event("transactions", doc["id"], {name_field: name}) for doc in batch])
+
+            # Saving progress also checks the job is still ours to run
+            saved = await db[JOBS_COLLECTION].update_one(
+                {"_id": job_id, "status": "running"},
+                {"$set": {"lastId": last_id, "updatedAt": _now()},
+                 "$inc": {"updated": result.modified_count, "batches": 1}}
+            )
+            if saved.matched_count == 0:
+                return
+
+        await self._finish(db, job_id)
+
+    async def _finish(self, db, job_id):
+        now = _now()
+        await db[JOBS_COLLECTION].update_one(
+            {"_id": job_id, "status": "running"},
+            {"$set": {"status": "done", "updatedAt": now, "finishedAt": now}}
+        )
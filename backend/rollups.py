@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Materialized spend/income rollups
+One document per (month, categoryId, accountId, type, status) holding the
+summed amount and transaction count. The transaction write handlers keep it
+current with $inc deltas; `python rollups.py rebuild` regenerates it from the
+ledger if it ever drifts.
+"""
+
+import asyncio
+from pathlib import Path
+
+from pymongo import UpdateOne
+
+ROLLUPS_COLLECTION = "rollups"
+
+KEY_FIELDS = ["month", "categoryId", "accountId", "type", "status"]
+
+
+def rollup_key(transaction: dict) -> dict:
+    return {
+        "month": transaction["date"][:7],
+        "categoryId": transaction["categoryId"],
+        "accountId": transaction["accountId"],
+        "type": transaction["type"],
+        "status": transaction["status"],
+    }
+
+
+def _delta(transaction: dict, sign: int) -> UpdateOne:
+    return UpdateOne(
+        rollup_key(transaction),
+        {"$inc": {"total": sign * transaction["amount"], "count": sign}},
+        upsert=True
+    )
+
+
+async def apply_transaction_change(db, old: dict = None, new: dict = None):
+    """Move a transaction's contribution from `old` to `new` (either may be None)"""
+    operations = []
+    if old:
+        operations.append(_delta(old, -1))
+    if new:
+        operations.append(_delta(new, 1))
+    if operations:
+        await db[ROLLUPS_COLLECTION].bulk_write(operations, ordered=False)
+
+
+async def apply_transactions(db, transactions: list, sign: int = 1):
+    """Add (or with sign=-1 remove) many transactions, one upsert per distinct key"""
+    totals = {}
+    for transaction in transactions:
+        key = tuple(rollup_key(transaction).items())
+        total, count = totals.get(key, (0, 0))
+        totals[key] = (total + sign * transaction["amount"], count + sign)
+    if totals:
+        await db[ROLLUPS_COLLECTION].bulk_write([
+            UpdateOne(dict(key), {"$inc": {"total": total, "count": count}}, upsert=True)
+            for key, (total, count) in totals.items()
+        ], ordered=False)
+
+
+def rollup_pipeline(match: dict = None) -> list:
+    """Group transactions into rollup-shaped documents"""
+    pipeline = [{"$match": match}] if match else []
+    pipeline += [
+        {
+            "$group": {
+                "_id": {
+                    "month": {"$substr": ["$date", 0, 7]},
+                    "categoryId": "$categoryId",
+                    "accountId": "$accountId",
+                    "type": "$type",
+                    "status": "$status"
+                },
+                "total": {"$sum": "$amount"},
+                "count": {"$sum": 1}
+            }
+        },
+        {"$project": {"_id": 0, **{field: f"$_id.{field}" for field in KEY_FIELDS}, "total": 1, "count": 1}}
+    ]
+    return pipeline
+
+
+async def rebuild_rollups(db):
+    """
+    Regenerate the rollup collection from the ledger.
+    $out swaps the collection in atomically (keeping its indexes); writes that
+    land while the rebuild runs may be missed, so run it during quiet periods.
+    """
+    await db.transactions.aggregate(rollup_pipeline() + [{"$out": ROLLUPS_COLLECTION}]).to_list(None)
+
+
+async def ensure_rollups(db):
+    """Build the rollups once for databases that predate them"""
+    if await db[ROLLUPS_COLLECTION].estimated_document_count() == 0 \
+            and await db.transactions.estimated_document_count() > 0:
+        await rebuild_rollups(db)
+
+
+async def main():
+    from dotenv import load_dotenv
+    from database import create_mongo_client, database_name
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = create_mongo_client()
+    try:
+        db = client[database_name()]
+        print("🔄 Rebuilding rollups from transactions...")
+        await rebuild_rollups(db)
+        print(f"✅ Rollups rebuilt: {await db[ROLLUPS_COLLECTION].count_documents({})} documents")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python rollups.py rebuild")
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+"""
+Transaction search
+Two index-backed modes replace the old unanchored, unescaped $regex scan:
+- "text": MongoDB $text over categoryName, notes and clientVendorName, with
+  stemming and optional relevance ordering
+- "prefix": each search word must prefix-match a term in `searchTerms`, a
+  lowercased token list kept on every transaction at write time; anchored
+  regexes on it are answered from the multikey index
+"""
+
+import re
+
+from pymongo import UpdateOne
+
+TEXT_FIELDS = ["categoryName", "notes", "clientVendorName"]
+TERMS_FIELD = "searchTerms"
+SEARCH_MODES = ["text", "prefix"]
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> list:
+    return [word.lower() for word in _WORD.findall(text or "")]
+
+
+def search_terms(transaction: dict) -> list:
+    """Distinct lowercased words across the searchable fields"""
+    terms = set()
+    for field in TEXT_FIELDS:
+        terms.update(tokenize(transaction.get(field, "")))
+    return sorted(terms)
+
+
+def search_filter(search: str, mode: str = "text") -> dict:
+    words = tokenize(search)
+    if not words:
+        # Nothing searchable (e.g. only punctuation): match nothing rather than everything
+        return {TERMS_FIELD: {"$in": []}}
+
+    if mode == "prefix":
+        # re.escape keeps user input literal; the ^ anchor lets the index bound the scan
+        clauses = [{TERMS_FIELD: {"$regex": f"^{re.escape(word)}"}} for word in words]
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    # Re-joining the \w+ tokens drops the characters $text treats as syntax
+    # ('"' phrases and '-' negation); words are OR-ed and ranked by textScore
+    return {"$text": {"$search": " ".join(words)}}
+
+
+async def backfill_search_terms(db, batch_size: int = 1000):
+    """Populate searchTerms on transactions written before it existed"""
+    projection = {"_id": 1, **{field: 1 for field in TEXT_FIELDS}}
+    cursor = db.transactions.find({TERMS_FIELD: {"$exists": False}}, projection).batch_size(batch_size)
+    operations = []
+    async for doc in cursor:
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {TERMS_FIELD: search_terms(doc)}}))
+        if len(operations) >= batch_size:
+            await db.transactions.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        await db.transactions.bulk_write(operations, ordered=False)
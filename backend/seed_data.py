@@ -5,20 +5,20 @@ Populates MongoDB with initial mock data
 """
 
 import asyncio
-import os
-from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 from pathlib import Path
+from balances import ensure_balances
+from changes import ensure_feed
+from database import create_mongo_client, database_name
+from ids import sync_counters
+from indexes import ensure_indexes
+from rollups import rebuild_rollups
+from versions import bump_versions
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
 # Mock data
 categories_data = [
     # Income Categories  
@@ -107,6 +107,10 @@ async def seed_database():
     """Seed the database with initial data"""
     print("🌱 Starting database seeding...")
     
+    # Same connection settings as the API server (database.py)
+    client = create_mongo_client()
+    db = client[database_name()]
+    
     try:
         # Clear existing data
         print("🧹 Clearing existing data...")
@@ -116,6 +120,12 @@ async def seed_database():
         await db.vendors.delete_many({})
         await db.budgets.delete_many({})
         await db.transactions.delete_many({})
+        await db.counters.delete_many({})
+        await db.propagation_jobs.delete_many({})
+        await db.account_balance_days.delete_many({})
+        await db.alerts.delete_many({})
+        # Sequence numbers restart with the counters, so events from before can't be resumed from
+        await db.change_events.drop()
         
         # Insert categories
         print("📁 Inserting categories...")
@@ -141,6 +151,22 @@ async def seed_database():
         print("💳 Inserting transactions...")
         await db.transactions.insert_many(transactions_data)
         
+        # Build indexes and point the id counters past the seeded ids
+        print("🔢 Creating indexes and syncing id counters...")
+        await ensure_feed(db)
+        await ensure_indexes(db)
+        await sync_counters(db)
+        
+        print("📊 Building rollups...")
+        await rebuild_rollups(db)
+        
+        # The seeded balances are current; opening balances are derived from the ledger
+        print("🏦 Deriving opening balances and daily balance changes...")
+        await ensure_balances(db)
+        
+        # Cached list responses from before the reseed must not revalidate
+        await bump_versions(db, ["categories", "accounts", "clients", "vendors", "budgets", "transactions"])
+        
         # Verify data
         categories_count = await db.categories.count_documents({})
         accounts_count = await db.accounts.count_documents({})
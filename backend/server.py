@@ -1,24 +1,132 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException, Query, Request, Response, UploadFile, File
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, create_model, field_validator
+from typing import Dict, List, Optional, Tuple
+from alerts import ALERTS_COLLECTION, AlertEngine, list_alerts
+from analytics import timeseries
+from balances import (
+    BALANCE_DAYS_COLLECTION, apply_balance_change, apply_balances, balance_history, balances_at,
+    ensure_balances, rebuild_balance_days, reconcile_balances
+)
+from batch import MAX_BATCH_SIZE, BatchRequest, execute_batch
+from cache import ALL, REFERENCE_COLLECTIONS, ReferenceCache
+from changes import ChangeFeed, diff_events, ensure_feed, reset_event, update_event
+from database import create_mongo_client, database_name
+from dates import is_month_aligned, normalize_date, normalize_stored_dates
+from ids import IdAllocator, sync_counters
+from indexes import ensure_indexes, index_report
+from ledger_io import (
+    EXPORT_BATCH_SIZE, export_csv, export_parquet, import_transactions, load_reference_maps, parquet_available, read_rows
+)
+from metrics import MetricsMiddleware, MongoCommandListener, PoolMetricsListener, SlowRequestProfiler, registry
+from propagation import JOBS_COLLECTION, PropagationWorker
+from rollups import ROLLUPS_COLLECTION, apply_transaction_change, apply_transactions, ensure_rollups, rebuild_rollups
+from search import TERMS_FIELD, backfill_search_terms, search_filter, search_terms
+from versions import bump_versions, etag_matches, get_versions
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+from functools import lru_cache
+import asyncio
+import base64
+import json
+import orjson
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection, opened by the lifespan below: one client (and pool) per worker process
+client: Optional[AsyncIOMotorClient] = None
+db: Optional[AsyncIOMotorDatabase] = None
+
+# Integer ids come from the counters collection; ID_BLOCK_SIZE > 1 reserves ranges in memory
+id_allocator = IdAllocator(int(os.environ.get('ID_BLOCK_SIZE', '1')))
+
+# Renames of categories, accounts, clients and vendors reach transactions in the background,
+# reported batch by batch like any other transaction write
+propagator = PropagationWorker(changed=lambda events: collections_changed("transactions", events=events))
+
+# Write handlers describe their changes to /api/stream clients through a capped collection
+feed = ChangeFeed()
+
+# Low-balance and budget-overrun alerts are re-evaluated in the background for what each write touched;
+# their transitions go out through the change feed
+alerts = AlertEngine(feed, debounce=float(os.environ.get('ALERT_DEBOUNCE_MS', '500')) / 1000)
+
+# Categories, accounts, clients and vendors are cached per worker
+ref_cache = ReferenceCache(
+    maxsize=int(os.environ.get('REFERENCE_CACHE_SIZE', '4096')),
+    ttl=float(os.environ.get('REFERENCE_CACHE_TTL', '60'))
+)
+
+# Names copied into new documents come from entries at most this old, so a rename made
+# through another worker (without a change stream) drifts into new writes only briefly
+WRITE_NAMES_MAX_AGE = float(os.environ.get('REFERENCE_CACHE_WRITE_TTL', '5'))
+
+# Fast mode sends list documents (already projected without _id) straight to orjson
+# instead of rebuilding a model per row and validating it again for response_model
+FAST_RESPONSES = os.environ.get('FAST_RESPONSES', '1') == '1'
+
+# List responses may be stored by browsers/proxies but must be revalidated (ETag)
+LIST_CACHE_CONTROL = os.environ.get('LIST_CACHE_CONTROL', 'no-cache')
+
+# Set PROFILE_SLOW_MS to write folded stacks (flamegraph input) for slower requests to PROFILE_DIR
+PROFILE_SLOW_MS = os.environ.get('PROFILE_SLOW_MS')
+profiler = SlowRequestProfiler(
+    threshold=float(PROFILE_SLOW_MS) / 1000,
+    interval=float(os.environ.get('PROFILE_INTERVAL_MS', '5')) / 1000,
+    directory=Path(os.environ.get('PROFILE_DIR', ROOT_DIR / 'profiles'))
+) if PROFILE_SLOW_MS else None
+
+async def prepare_ledger():
+    # Dates first: the rollup month keys and balance days are derived from them
+    if await normalize_stored_dates(db):
+        await rebuild_rollups(db)
+        await rebuild_balance_days(db)
+    else:
+        await ensure_rollups(db)
+    await ensure_balances(db)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, db
+    # Pool size, timeouts, compression and read preference come from the environment (database.py);
+    # the listeners feed command timings and pool gauges to /metrics
+    client = create_mongo_client(event_listeners=[MongoCommandListener(), PoolMetricsListener()])
+    db = client[database_name()]
+    # Created capped (CHANGE_FEED_SIZE_MB) before the index builds below could create it as a plain collection
+    await ensure_feed(db)
+    
+    # Index builds can take a while on large ledgers; don't hold up startup for them
+    tasks = [
+        asyncio.create_task(ensure_indexes(db)),
+        asyncio.create_task(prepare_ledger()),
+        asyncio.create_task(backfill_search_terms(db)),
+        asyncio.create_task(ref_cache.watch(db)),
+        asyncio.create_task(propagator.run(db)),
+        asyncio.create_task(alerts.run(db)),
+        asyncio.create_task(feed.run(db)),
+    ]
+    try:
+        await sync_counters(db)
+        yield
+    finally:
+        # Stop background work before its connections go away
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        client.close()
 
 # Create the main app without a prefix
-app = FastAPI(title="Income & Expense Tracker API", version="1.0.0")
+app = FastAPI(title="Income & Expense Tracker API", version="1.0.0", lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -29,6 +137,51 @@ def serialize_doc(doc):
         del doc["_id"]  # Remove MongoDB ObjectId, keep the integer id field
     return doc
 
+async def cached_collection(collection: str, max_age: Optional[float] = None, version: Optional[int] = None) -> list:
+    # Whole reference collection (they're small); callers must not mutate the docs.
+    # With the collection's version (read before calling), the snapshot is one loaded
+    # at that version or later: another worker's write bumps the version, which this
+    # worker's cache would otherwise not hear about on a standalone server
+    return await ref_cache.lookup(
+        collection, ALL if version is None else (ALL, version),
+        lambda: db[collection].find({}, {"_id": 0}).to_list(1000), max_age
+    )
+
+async def cached_entity(collection: str, entity_id: int, max_age: Optional[float] = None) -> Optional[dict]:
+    return await ref_cache.lookup(
+        collection, entity_id, lambda: db[collection].find_one({"id": entity_id}, {"_id": 0}), max_age
+    )
+
+async def collections_changed(*collections: str, events: List[dict] = ()):
+    # Every write handler reports here once its write is done: reference cache
+    # invalidation, the version counters behind the list ETags and the change feed
+    for collection in collections:
+        if collection in REFERENCE_COLLECTIONS:
+            ref_cache.invalidate(collection)
+    await asyncio.gather(bump_versions(db, collections), feed.record(db, list(events)))
+
+async def not_modified(request: Request, response: Response, collections: List[str],
+                       variant: str = "") -> Tuple[Optional[Response], Dict[str, int]]:
+    # Versions are read before the data, so an ETag never vouches for newer data than was sent;
+    # they're returned so cached data can be checked against them
+    versions = await get_versions(db, collections)
+    etag = 'W/"' + "-".join(f"{name}.{version}" for name, version in versions.items()) + variant + '"'
+    headers = {"ETag": etag, "Cache-Control": LIST_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers), versions
+    response.headers.update(headers)
+    return None, versions
+
+def list_response(docs: List[dict], model, response: Response, subset: bool = False):
+    if FAST_RESPONSES:
+        # Every write goes through the models, so stored documents already have their shape;
+        # headers set on `response` (ETag, cursor) don't carry over to a returned Response
+        return ORJSONResponse(docs, headers=dict(response.headers))
+    if subset:
+        # A field-subset model can't pass the route's response_model, so it's encoded here
+        return JSONResponse([model(**doc).dict() for doc in docs], headers=dict(response.headers))
+    return [model(**doc) for doc in docs]
+
 # === MODELS ===
 
 class Category(BaseModel):
@@ -46,15 +199,21 @@ class Account(BaseModel):
     id: Optional[int] = None
     name: str
     type: str  # 'checking', 'savings', 'credit'
-    balance: float
+    balance: float  # openingBalance plus completed transactions, maintained by balances.py
+    openingBalance: Optional[float] = None
     lowBalanceThreshold: float
 
 class AccountCreate(BaseModel):
     name: str
     type: str
-    balance: float
+    balance: Optional[float] = None  # starting balance on create; rejected on update (change openingBalance instead)
+    openingBalance: Optional[float] = None
     lowBalanceThreshold: float
 
+# The balance follows the ledger, so it is only ever set on create
+BALANCE_REQUIRED = "balance or openingBalance is required"
+BALANCE_READ_ONLY = "balance follows the transactions; change openingBalance instead"
+
 class Transaction(BaseModel):
     id: Optional[int] = None
     date: str
@@ -80,6 +239,12 @@ class TransactionCreate(BaseModel):
     status: str = "completed"
     notes: str = ""
     recurring: bool = False
+    
+    @field_validator("date", mode="before")
+    @classmethod
+    def iso_date(cls, value):
+        # Stored as ISO YYYY-MM-DD so string ranges and sorts are chronological
+        return normalize_date(value)
 
 class Client(BaseModel):
     id: Optional[int] = None
@@ -116,287 +281,642 @@ class BudgetCreate(BaseModel):
 # === CATEGORIES ENDPOINTS ===
 
 @api_router.get("/categories", response_model=List[Category])
-async def get_categories():
-    categories = await db.categories.find().to_list(1000)
-    return [Category(**serialize_doc(cat)) for cat in categories]
+async def get_categories(request: Request, response: Response):
+    unchanged, versions = await not_modified(request, response, ["categories"])
+    if unchanged:
+        return unchanged
+    categories = await cached_collection("categories", version=versions["categories"])
+    return list_response(categories, Category, response)
 
 @api_router.post("/categories", response_model=Category)
 async def create_category(category: CategoryCreate):
-    # Get next ID
-    last_cat = await db.categories.find_one(sort=[("id", -1)])
-    next_id = (last_cat["id"] + 1) if last_cat and "id" in last_cat else 1
+    next_id = await id_allocator.next_id(db, "categories")
     
     category_dict = category.dict()
     category_dict["id"] = next_id
     
     result = await db.categories.insert_one(category_dict)
+    await collections_changed("categories", events=diff_events("categories", [(None, category_dict)]))
     created_category = await db.categories.find_one({"_id": result.inserted_id})
     return Category(**serialize_doc(created_category))
 
 @api_router.put("/categories/{category_id}", response_model=Category)
 async def update_category(category_id: int, category: CategoryCreate):
-    result = await db.categories.update_one(
+    update = category.dict()
+    old_category = await db.categories.find_one_and_update(
         {"id": category_id},
-        {"$set": category.dict()}
+        {"$set": update},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
     )
-    if result.matched_count == 0:
+    if old_category is None:
         raise HTTPException(status_code=404, detail="Category not found")
+    await collections_changed("categories", events=diff_events("categories", [(old_category, {**old_category, **update})]))
+    if old_category["name"] != update["name"]:
+        # Transactions are renamed in the background
+        await propagator.enqueue(db, "categories", category_id, update["name"])
     
-    updated_category = await db.categories.find_one({"id": category_id})
-    return Category(**serialize_doc(updated_category))
+    return Category(**{**old_category, **update})
 
 @api_router.delete("/categories/{category_id}")
 async def delete_category(category_id: int):
     result = await db.categories.delete_one({"id": category_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Category not found")
+    await collections_changed("categories", events=diff_events("categories", [({"id": category_id}, None)]))
     return {"message": "Category deleted successfully"}
 
 # === ACCOUNTS ENDPOINTS ===
 
 @api_router.get("/accounts", response_model=List[Account])
-async def get_accounts():
-    accounts = await db.accounts.find().to_list(1000)
-    return [Account(**serialize_doc(acc)) for acc in accounts]
+async def get_accounts(request: Request, response: Response):
+    unchanged, versions = await not_modified(request, response, ["accounts"])
+    if unchanged:
+        return unchanged
+    accounts = await cached_collection("accounts", version=versions["accounts"])
+    return list_response(accounts, Account, response)
 
 @api_router.post("/accounts", response_model=Account)
 async def create_account(account: AccountCreate):
-    last_acc = await db.accounts.find_one(sort=[("id", -1)])
-    next_id = (last_acc["id"] + 1) if last_acc and "id" in last_acc else 1
+    if account.balance is None and account.openingBalance is None:
+        raise HTTPException(status_code=400, detail=BALANCE_REQUIRED)
+    next_id = await id_allocator.next_id(db, "accounts")
     
     account_dict = account.dict()
     account_dict["id"] = next_id
+    # A new account has no transactions yet, so it starts at its opening balance
+    if account_dict["openingBalance"] is None:
+        account_dict["openingBalance"] = account_dict["balance"]
+    account_dict["balance"] = account_dict["openingBalance"]
     
     result = await db.accounts.insert_one(account_dict)
+    await collections_changed("accounts", events=diff_events("accounts", [(None, account_dict)]))
+    alerts.touch_account(next_id)
     created_account = await db.accounts.find_one({"_id": result.inserted_id})
     return Account(**serialize_doc(created_account))
 
+def account_update(fields: dict, opening_balance: Optional[float]) -> list:
+    # A pipeline update reads field paths from "$..." strings, so client values go in as literals
+    update = {field: {"$literal": value} for field, value in fields.items()}
+    # The balance follows the ledger; a new opening balance shifts it by the difference,
+    # in the same atomic update so deltas from concurrent transaction writes aren't lost
+    if opening_balance is not None:
+        opening = {"$ifNull": ["$openingBalance", opening_balance]}
+        update["balance"] = {"$add": ["$balance", {"$subtract": [opening_balance, opening]}]}
+        update["openingBalance"] = {"$literal": opening_balance}
+    return [{"$set": update}]
+
 @api_router.put("/accounts/{account_id}", response_model=Account)
 async def update_account(account_id: int, account: AccountCreate):
-    result = await db.accounts.update_one(
+    if account.balance is not None:
+        # Setting it directly would undo the deltas of transactions written since it was read
+        raise HTTPException(status_code=400, detail=BALANCE_READ_ONLY)
+    fields = account.dict(exclude={"balance", "openingBalance"})
+    old_account = await db.accounts.find_one_and_update(
         {"id": account_id},
-        {"$set": account.dict()}
+        account_update(fields, account.openingBalance),
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
     )
-    if result.matched_count == 0:
+    if old_account is None:
         raise HTTPException(status_code=404, detail="Account not found")
     
-    updated_account = await db.accounts.find_one({"id": account_id})
-    return Account(**serialize_doc(updated_account))
+    new_account = {**old_account, **fields}
+    if account.openingBalance is not None:
+        new_account["balance"] += account.openingBalance - old_account.get("openingBalance", account.openingBalance)
+        new_account["openingBalance"] = account.openingBalance
+    await collections_changed("accounts", events=diff_events("accounts", [(old_account, new_account)]))
+    alerts.touch_account(account_id)
+    if old_account["name"] != fields["name"]:
+        # Transactions are renamed in the background
+        await propagator.enqueue(db, "accounts", account_id, fields["name"])
+    return Account(**new_account)
 
 @api_router.delete("/accounts/{account_id}")
 async def delete_account(account_id: int):
     result = await db.accounts.delete_one({"id": account_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Account not found")
+    await db[BALANCE_DAYS_COLLECTION].delete_many({"accountId": account_id})
+    await collections_changed("accounts", events=diff_events("accounts", [({"id": account_id}, None)]))
+    alerts.touch_account(account_id)
     return {"message": "Account deleted successfully"}
 
-# === TRANSACTIONS ENDPOINTS ===
+@api_router.get("/accounts/balances")
+async def get_account_balances(
+    as_of: Optional[str] = Query(None, alias="date", pattern=r"^\d{4}-\d{2}-\d{2}$")
+):
+    # Balances at the end of a day; without a date, the maintained current balances
+    if as_of is None:
+        versions = await get_versions(db, ["accounts"])
+        accounts = await cached_collection("accounts", version=versions["accounts"])
+        return [{"accountId": a["id"], "name": a["name"], "balance": a["balance"]} for a in accounts]
+    return await balances_at(db, as_of)
 
-@api_router.get("/transactions", response_model=List[Transaction])
-async def get_transactions(
-    type: Optional[str] = Query(None),
-    status: Optional[str] = Query(None),
-    search: Optional[str] = Query(None)
+@api_router.get("/accounts/{account_id}/balance-history")
+async def get_balance_history(
+    account_id: int,
+    date_from: Optional[str] = Query(None, alias="from", pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    date_to: Optional[str] = Query(None, alias="to", pattern=r"^\d{4}-\d{2}-\d{2}$")
 ):
+    account = await cached_entity("accounts", account_id)
+    if account is None:
+        raise HTTPException(status_code=404, detail="Account not found")
+    date_to = date_to or date.today().isoformat()
+    try:
+        date_from = date_from or (date.fromisoformat(date_to) - timedelta(days=89)).isoformat()
+        return await balance_history(db, account, date_from, date_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.post("/accounts/reconcile")
+async def reconcile_account_balances(dry_run: bool = Query(False, alias="dryRun")):
+    # Recompute every balance from the ledger; drift means a delta was lost (e.g. a crash mid-write)
+    report = await reconcile_balances(db, fix=not dry_run)
+    if report["corrected"]:
+        await collections_changed("accounts", events=[
+            update_event("accounts", entry["id"], {"balance": entry["expected"]})
+            for entry in report["accounts"] if entry.get("corrected")
+        ])
+        alerts.touch_all()
+    return report
+
+# === TRANSACTIONS ENDPOINTS ===
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 5000
+STREAM_BATCH_SIZE = 500
+
+# Transactions are ordered newest first; id breaks ties between rows sharing a date
+TRANSACTION_SORT = [("date", -1), ("id", -1)]
+
+# searchTerms is an internal search index field, never returned to clients
+TRANSACTION_PROJECTION = {"_id": 0, TERMS_FIELD: 0}
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    if not fields:
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - Transaction.model_fields.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    # id is always returned so rows stay addressable; model order keeps the tuple canonical
+    requested.add("id")
+    return tuple(field for field in Transaction.model_fields if field in requested)
+
+@lru_cache(maxsize=256)
+def transaction_subset_model(fields: Tuple[str, ...]):
+    # Built once per distinct ?fields= selection
+    return create_model(
+        "TransactionFields",
+        **{field: (Transaction.model_fields[field].annotation, Transaction.model_fields[field]) for field in fields}
+    )
+
+def build_transaction_filter(
+    type: Optional[str],
+    status: Optional[str],
+    search: Optional[str],
+    search_mode: str = "text",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    account_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    client_vendor_id: Optional[int] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None
+) -> dict:
     filter_dict = {}
     
     if type and type != "all":
         filter_dict["type"] = type
     if status and status != "all":
         filter_dict["status"] = status
+    if account_id is not None:
+        filter_dict["accountId"] = account_id
+    if category_id is not None:
+        filter_dict["categoryId"] = category_id
+    if client_vendor_id is not None:
+        filter_dict["clientVendorId"] = client_vendor_id
+    
+    # Inclusive bounds; ISO date strings compare chronologically
+    if date_from or date_to:
+        filter_dict["date"] = {}
+        if date_from:
+            filter_dict["date"]["$gte"] = date_from
+        if date_to:
+            filter_dict["date"]["$lte"] = date_to
+    if min_amount is not None or max_amount is not None:
+        filter_dict["amount"] = {}
+        if min_amount is not None:
+            filter_dict["amount"]["$gte"] = min_amount
+        if max_amount is not None:
+            filter_dict["amount"]["$lte"] = max_amount
+    
     if search:
-        filter_dict["$or"] = [
-            {"categoryName": {"$regex": search, "$options": "i"}},
-            {"notes": {"$regex": search, "$options": "i"}},
-            {"clientVendorName": {"$regex": search, "$options": "i"}}
+        filter_dict.update(search_filter(search, search_mode))
+    return filter_dict
+
+def transaction_filter(
+    type: Optional[str] = Query(None),
+    status: Optional[str] = Query(None),
+    search: Optional[str] = Query(None),
+    searchMode: str = Query("text", pattern="^(text|prefix)$"),
+    from_date: Optional[str] = Query(None, alias="from", pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    to_date: Optional[str] = Query(None, alias="to", pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    accountId: Optional[int] = Query(None),
+    categoryId: Optional[int] = Query(None),
+    clientVendorId: Optional[int] = Query(None),
+    minAmount: Optional[float] = Query(None),
+    maxAmount: Optional[float] = Query(None)
+) -> dict:
+    # Query parameters shared by the listing and the export
+    try:
+        for value in (from_date, to_date):
+            if value:
+                date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date")
+    return build_transaction_filter(
+        type, status, search, searchMode,
+        date_from=from_date, date_to=to_date,
+        account_id=accountId, category_id=categoryId, client_vendor_id=clientVendorId,
+        min_amount=minAmount, max_amount=maxAmount
+    )
+
+def encode_cursor(doc: dict) -> str:
+    # Opaque keyset cursor: the (date, id) of the last row on the page
+    raw = json.dumps([doc["date"], doc["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        last_date, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(last_date, str) or not isinstance(last_id, int):
+            raise ValueError(cursor)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {
+        "$or": [
+            {"date": {"$lt": last_date}},
+            {"date": last_date, "id": {"$lt": last_id}}
         ]
+    }
+
+async def stream_ndjson(cursor):
+    # Flush one chunk per batch so memory stays flat regardless of result size
+    lines = []
+    async for doc in cursor:
+        lines.append(orjson.dumps(doc))
+        if len(lines) >= STREAM_BATCH_SIZE:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+@api_router.get("/transactions", response_model=List[Transaction])
+async def get_transactions(
+    response: Response,
+    filter_dict: dict = Depends(transaction_filter),
+    order: str = Query("date", pattern="^(date|relevance)$"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    stream: bool = Query(False),
+    fields: Optional[str] = Query(None)
+):
+    selected = parse_fields(fields)
+    projection = {"_id": 0, **dict.fromkeys(selected, 1)} if selected else TRANSACTION_PROJECTION
+    sort = TRANSACTION_SORT
+    
+    if order == "relevance":
+        if "$text" not in filter_dict:
+            raise HTTPException(status_code=400, detail="Relevance ordering requires a text search")
+        if cursor:
+            raise HTTPException(status_code=400, detail="Cursor pagination is not available with relevance ordering")
+        # Sorting on the score doesn't need it projected (MongoDB 4.4+), so rows keep their shape
+        sort = [("score", {"$meta": "textScore"})] + TRANSACTION_SORT
+    
+    if cursor:
+        keyset = decode_cursor(cursor)
+        filter_dict = {"$and": [filter_dict, keyset]} if filter_dict else keyset
     
-    transactions = await db.transactions.find(filter_dict).sort("date", -1).to_list(1000)
-    return [Transaction(**serialize_doc(trans)) for trans in transactions]
+    if stream:
+        # NDJSON mode: iterate the Motor cursor in batches instead of buffering a page
+        db_cursor = db.transactions.find(filter_dict, projection).sort(sort).batch_size(STREAM_BATCH_SIZE)
+        if limit:
+            db_cursor = db_cursor.limit(limit)
+        return StreamingResponse(stream_ndjson(db_cursor), media_type="application/x-ndjson")
+    
+    # Fetch one extra row to learn whether another page exists
+    page_size = limit or DEFAULT_PAGE_SIZE
+    # The keyset cursor needs the last row's date even when it wasn't selected
+    page_projection = {**projection, "date": 1} if selected else projection
+    transactions = await db.transactions.find(filter_dict, page_projection).sort(sort).limit(page_size + 1).to_list(page_size + 1)
+    if len(transactions) > page_size:
+        transactions = transactions[:page_size]
+        if order == "date":
+            response.headers["X-Next-Cursor"] = encode_cursor(transactions[-1])
+    
+    if selected:
+        if "date" not in selected:
+            for trans in transactions:
+                del trans["date"]
+        return list_response(transactions, transaction_subset_model(selected), response, subset=True)
+    return list_response(transactions, Transaction, response)
 
-@api_router.post("/transactions", response_model=Transaction)
-async def create_transaction(transaction: TransactionCreate):
-    # Get category and account names
-    category = await db.categories.find_one({"id": transaction.categoryId})
+async def find_client_or_vendor(party_id: int) -> Optional[dict]:
+    # clientVendorId may name a client or a vendor; one query checks both,
+    # preferring the client when both collections use the same id
+    parties = await db.clients.aggregate([
+        {"$match": {"id": party_id}},
+        {"$addFields": {"_rank": 0}},
+        {"$unionWith": {"coll": "vendors", "pipeline": [{"$match": {"id": party_id}}, {"$addFields": {"_rank": 1}}]}},
+        {"$sort": {"_rank": 1}},
+        {"$limit": 1},
+        {"$project": {"_id": 0, "name": 1}}
+    ]).to_list(1)
+    return parties[0] if parties else None
+
+async def resolve_transaction_names(transaction: TransactionCreate) -> dict:
+    # Served from the reference cache; misses are independent and load concurrently
+    lookups = [
+        cached_entity("categories", transaction.categoryId, WRITE_NAMES_MAX_AGE),
+        cached_entity("accounts", transaction.accountId, WRITE_NAMES_MAX_AGE)
+    ]
+    if transaction.clientVendorId:
+        party_id = transaction.clientVendorId
+        lookups.append(ref_cache.lookup(
+            "parties", party_id, lambda: find_client_or_vendor(party_id), WRITE_NAMES_MAX_AGE
+        ))
+    category, account, *party = await asyncio.gather(*lookups)
+    
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
-    
-    account = await db.accounts.find_one({"id": transaction.accountId})
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
     
-    # Get client/vendor name if provided
-    client_vendor_name = ""
-    if transaction.clientVendorId:
-        client = await db.clients.find_one({"id": transaction.clientVendorId})
-        vendor = await db.vendors.find_one({"id": transaction.clientVendorId})
-        if client:
-            client_vendor_name = client["name"]
-        elif vendor:
-            client_vendor_name = vendor["name"]
-    
-    # Generate next ID
-    last_trans = await db.transactions.find_one(sort=[("id", -1)])
-    next_id = (last_trans["id"] + 1) if last_trans and "id" in last_trans else 1
+    return {
+        "categoryName": category["name"],
+        "accountName": account["name"],
+        "clientVendorName": party[0]["name"] if party and party[0] else ""
+    }
+
+def balance_events(balances: Dict[int, float]) -> List[dict]:
+    # Change feed updates carrying the new balance of every account a write moved
+    return [update_event("accounts", account_id, {"balance": balance}) for account_id, balance in balances.items()]
+
+async def ledger_changed(old: Optional[dict] = None, new: Optional[dict] = None):
+    # Every single-transaction write moves the rollups and, for completed ones, an account balance
+    _, balances = await asyncio.gather(
+        apply_transaction_change(db, old=old, new=new),
+        apply_balance_change(db, old=old, new=new)
+    )
+    events = diff_events("transactions", [(old, new)])
+    if balances:
+        events += balance_events(balances)
+        await collections_changed("transactions", "accounts", events=events)
+    else:
+        await collections_changed("transactions", events=events)
+    alerts.touch_transactions(t for t in (old, new) if t)
+
+@api_router.post("/transactions", response_model=Transaction)
+async def create_transaction(transaction: TransactionCreate):
+    # Name lookups and id allocation in one concurrent step
+    names, next_id = await asyncio.gather(
+        resolve_transaction_names(transaction),
+        id_allocator.next_id(db, "transactions")
+    )
     
     transaction_dict = transaction.dict()
     transaction_dict["id"] = next_id
-    transaction_dict["categoryName"] = category["name"]
-    transaction_dict["accountName"] = account["name"]
-    transaction_dict["clientVendorName"] = client_vendor_name
+    transaction_dict.update(names)
+    transaction_dict[TERMS_FIELD] = search_terms(transaction_dict)
     
-    result = await db.transactions.insert_one(transaction_dict)
-    created_transaction = await db.transactions.find_one({"_id": result.inserted_id})
-    return Transaction(**serialize_doc(created_transaction))
+    await db.transactions.insert_one(transaction_dict)
+    await ledger_changed(new=transaction_dict)
+    return Transaction(**transaction_dict)
 
-@api_router.put("/transactions/{transaction_id}", response_model=Transaction)
-async def update_transaction(transaction_id: int, transaction: TransactionCreate):
-    # Get category and account names
-    category = await db.categories.find_one({"id": transaction.categoryId})
-    account = await db.accounts.find_one({"id": transaction.accountId})
+@api_router.get("/transactions/export")
+async def export_transactions(
+    filter_dict: dict = Depends(transaction_filter),
+    format: str = Query("csv", pattern="^(csv|parquet)$")
+):
+    # Same filters as the listing, but streamed in full rather than paged
+    cursor = db.transactions.find(filter_dict, TRANSACTION_PROJECTION).sort(TRANSACTION_SORT).batch_size(EXPORT_BATCH_SIZE)
     
-    if not category or not account:
-        raise HTTPException(status_code=404, detail="Category or Account not found")
+    if format == "parquet":
+        if not parquet_available():
+            raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+        return StreamingResponse(
+            export_parquet(cursor),
+            media_type="application/vnd.apache.parquet",
+            headers={"Content-Disposition": 'attachment; filename="transactions.parquet"'}
+        )
     
-    # Get client/vendor name if provided
-    client_vendor_name = ""
-    if transaction.clientVendorId:
-        client = await db.clients.find_one({"id": transaction.clientVendorId})
-        vendor = await db.vendors.find_one({"id": transaction.clientVendorId})
-        if client:
-            client_vendor_name = client["name"]
-        elif vendor:
-            client_vendor_name = vendor["name"]
+    return StreamingResponse(
+        export_csv(cursor),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="transactions.csv"'}
+    )
+
+@api_router.post("/transactions/import")
+async def import_transactions_file(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$")
+):
+    # Rows reference categories/accounts/parties by id or name; see contracts.md
+    if format is None:
+        name = (file.filename or "").lower()
+        format = "ndjson" if name.endswith((".ndjson", ".jsonl")) else "csv"
     
+    rows = read_rows(file.file, format)
+    try:
+        report = await import_transactions(db, rows, TransactionCreate, id_allocator)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+    finally:
+        # Earlier chunks may have been written even if a later one failed; clients reload both
+        await collections_changed(
+            "transactions", "accounts", events=[reset_event("transactions"), reset_event("accounts")]
+        )
+        alerts.touch_all()
+    return report
+
+@api_router.put("/transactions/{transaction_id}", response_model=Transaction)
+async def update_transaction(transaction_id: int, transaction: TransactionCreate):
     transaction_dict = transaction.dict()
-    transaction_dict["categoryName"] = category["name"]
-    transaction_dict["accountName"] = account["name"]
-    transaction_dict["clientVendorName"] = client_vendor_name
+    transaction_dict.update(await resolve_transaction_names(transaction))
+    transaction_dict[TERMS_FIELD] = search_terms(transaction_dict)
     
-    result = await db.transactions.update_one(
+    # The pre-image is needed to move the rollup contribution; the updated
+    # document is the pre-image plus our $set, so there's no need to re-read it
+    old_transaction = await db.transactions.find_one_and_update(
         {"id": transaction_id},
-        {"$set": transaction_dict}
+        {"$set": transaction_dict},
+        return_document=ReturnDocument.BEFORE
     )
-    if result.matched_count == 0:
+    if old_transaction is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
-    updated_transaction = await db.transactions.find_one({"id": transaction_id})
-    return Transaction(**serialize_doc(updated_transaction))
+    updated_transaction = {**old_transaction, **transaction_dict}
+    await ledger_changed(old=old_transaction, new=updated_transaction)
+    return Transaction(**updated_transaction)
 
 @api_router.delete("/transactions/{transaction_id}")
 async def delete_transaction(transaction_id: int):
-    result = await db.transactions.delete_one({"id": transaction_id})
-    if result.deleted_count == 0:
+    deleted_transaction = await db.transactions.find_one_and_delete({"id": transaction_id})
+    if deleted_transaction is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
+    await ledger_changed(old=deleted_transaction)
     return {"message": "Transaction deleted successfully"}
 
 # === CLIENTS ENDPOINTS ===
 
 @api_router.get("/clients", response_model=List[Client])
-async def get_clients():
-    clients = await db.clients.find().to_list(1000)
-    return [Client(**serialize_doc(client)) for client in clients]
+async def get_clients(request: Request, response: Response):
+    unchanged, versions = await not_modified(request, response, ["clients"])
+    if unchanged:
+        return unchanged
+    clients = await cached_collection("clients", version=versions["clients"])
+    return list_response(clients, Client, response)
 
 @api_router.post("/clients", response_model=Client)
 async def create_client(client: ClientCreate):
-    last_client = await db.clients.find_one(sort=[("id", -1)])
-    next_id = (last_client["id"] + 1) if last_client and "id" in last_client else 1
+    next_id = await id_allocator.next_id(db, "clients")
     
     client_dict = client.dict()
     client_dict["id"] = next_id
     
     result = await db.clients.insert_one(client_dict)
+    await collections_changed("clients", events=diff_events("clients", [(None, client_dict)]))
     created_client = await db.clients.find_one({"_id": result.inserted_id})
     return Client(**serialize_doc(created_client))
 
 @api_router.put("/clients/{client_id}", response_model=Client)
 async def update_client(client_id: int, client: ClientCreate):
-    result = await db.clients.update_one(
+    update = client.dict()
+    old_client = await db.clients.find_one_and_update(
         {"id": client_id},
-        {"$set": client.dict()}
+        {"$set": update},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
     )
-    if result.matched_count == 0:
+    if old_client is None:
         raise HTTPException(status_code=404, detail="Client not found")
+    await collections_changed("clients", events=diff_events("clients", [(old_client, {**old_client, **update})]))
+    if old_client["name"] != update["name"]:
+        # Transactions are renamed in the background
+        await propagator.enqueue(db, "clients", client_id, update["name"])
     
-    updated_client = await db.clients.find_one({"id": client_id})
-    return Client(**serialize_doc(updated_client))
+    return Client(**{**old_client, **update})
 
 @api_router.delete("/clients/{client_id}")
 async def delete_client(client_id: int):
     result = await db.clients.delete_one({"id": client_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Client not found")
+    await collections_changed("clients", events=diff_events("clients", [({"id": client_id}, None)]))
     return {"message": "Client deleted successfully"}
 
 # === VENDORS ENDPOINTS ===
 
 @api_router.get("/vendors", response_model=List[Vendor])
-async def get_vendors():
-    vendors = await db.vendors.find().to_list(1000)
-    return [Vendor(**serialize_doc(vendor)) for vendor in vendors]
+async def get_vendors(request: Request, response: Response):
+    unchanged, versions = await not_modified(request, response, ["vendors"])
+    if unchanged:
+        return unchanged
+    vendors = await cached_collection("vendors", version=versions["vendors"])
+    return list_response(vendors, Vendor, response)
 
 @api_router.post("/vendors", response_model=Vendor)
 async def create_vendor(vendor: VendorCreate):
-    last_vendor = await db.vendors.find_one(sort=[("id", -1)])
-    next_id = (last_vendor["id"] + 1) if last_vendor and "id" in last_vendor else 1
+    next_id = await id_allocator.next_id(db, "vendors")
     
     vendor_dict = vendor.dict()
     vendor_dict["id"] = next_id
     
     result = await db.vendors.insert_one(vendor_dict)
+    await collections_changed("vendors", events=diff_events("vendors", [(None, vendor_dict)]))
     created_vendor = await db.vendors.find_one({"_id": result.inserted_id})
     return Vendor(**serialize_doc(created_vendor))
 
 @api_router.put("/vendors/{vendor_id}", response_model=Vendor)
 async def update_vendor(vendor_id: int, vendor: VendorCreate):
-    result = await db.vendors.update_one(
+    update = vendor.dict()
+    old_vendor = await db.vendors.find_one_and_update(
         {"id": vendor_id},
-        {"$set": vendor.dict()}
+        {"$set": update},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
     )
-    if result.matched_count == 0:
+    if old_vendor is None:
         raise HTTPException(status_code=404, detail="Vendor not found")
+    await collections_changed("vendors", events=diff_events("vendors", [(old_vendor, {**old_vendor, **update})]))
+    if old_vendor["name"] != update["name"]:
+        # Transactions are renamed in the background
+        await propagator.enqueue(db, "vendors", vendor_id, update["name"])
     
-    updated_vendor = await db.vendors.find_one({"id": vendor_id})
-    return Vendor(**serialize_doc(updated_vendor))
+    return Vendor(**{**old_vendor, **update})
 
 @api_router.delete("/vendors/{vendor_id}")
 async def delete_vendor(vendor_id: int):
     result = await db.vendors.delete_one({"id": vendor_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Vendor not found")
+    await collections_changed("vendors", events=diff_events("vendors", [({"id": vendor_id}, None)]))
     return {"message": "Vendor deleted successfully"}
 
 # === BUDGETS ENDPOINTS ===
 
 @api_router.get("/budgets", response_model=List[Budget])
-async def get_budgets():
-    budgets = await db.budgets.find().to_list(1000)
-    
-    # Calculate spent amounts from transactions
-    for budget in budgets:
-        spent = await db.transactions.aggregate([
-            {
-                "$match": {
-                    "categoryId": budget["categoryId"],
-                    "type": "expense",
-                    "status": "completed"
-                }
-            },
-            {
-                "$group": {
-                    "_id": None,
-                    "total": {"$sum": "$amount"}
-                }
+async def get_budgets(
+    request: Request,
+    response: Response,
+    month: Optional[str] = Query(None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$")
+):
+    # Spend is the month's completed expenses (current month by default)
+    month = month or date.today().strftime("%Y-%m")
+    
+    # Spend follows the transactions, names follow the categories; the month is part
+    # of the tag because the default one changes without any write
+    unchanged, _ = await not_modified(request, response, ["budgets", "categories", "transactions"], f"-{month}")
+    if unchanged:
+        return unchanged
+    
+    # One round trip regardless of how many budgets exist; spend comes from the
+    # handful of rollup documents per category rather than the raw ledger
+    budgets = await db.budgets.aggregate([
+        {
+            "$lookup": {
+                "from": ROLLUPS_COLLECTION,
+                "localField": "categoryId",
+                "foreignField": "categoryId",
+                "pipeline": [
+                    {"$match": {"month": month, "type": "expense", "status": "completed"}},
+                    {"$group": {"_id": None, "total": {"$sum": "$total"}}}
+                ],
+                "as": "spending"
             }
-        ]).to_list(1)
-        
-        budget["spent"] = spent[0]["total"] if spent else 0.0
-        
-        # Get category name
-        category = await db.categories.find_one({"id": budget["categoryId"]})
-        budget["categoryName"] = category["name"] if category else ""
+        },
+        {
+            "$lookup": {
+                "from": "categories",
+                "localField": "categoryId",
+                "foreignField": "id",
+                "as": "category"
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "categoryId": 1,
+                "monthlyBudget": 1,
+                "categoryName": {"$ifNull": [{"$arrayElemAt": ["$category.name", 0]}, ""]},
+                "spent": {"$ifNull": [{"$arrayElemAt": ["$spending.total", 0]}, 0.0]}
+            }
+        }
+    ]).to_list(1000)
     
-    return [Budget(**serialize_doc(budget)) for budget in budgets]
+    return list_response(budgets, Budget, response)
 
 @api_router.post("/budgets", response_model=Budget)
 async def create_budget(budget: BudgetCreate):
@@ -408,7 +928,12 @@ async def create_budget(budget: BudgetCreate):
     budget_dict["categoryName"] = category["name"]
     budget_dict["spent"] = 0.0
     
-    result = await db.budgets.insert_one(budget_dict)
+    try:
+        result = await db.budgets.insert_one(budget_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Budget already exists for this category")
+    await collections_changed("budgets", events=diff_events("budgets", [(None, budget_dict)], key="categoryId"))
+    alerts.touch_budget(budget.categoryId)
     created_budget = await db.budgets.find_one({"_id": result.inserted_id})
     return Budget(**serialize_doc(created_budget))
 
@@ -424,6 +949,10 @@ async def update_budget(category_id: int, budget: BudgetCreate):
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Budget not found")
+    await collections_changed("budgets", events=[
+        update_event("budgets", category_id, {"monthlyBudget": budget.monthlyBudget})
+    ] if result.modified_count else [])
+    alerts.touch_budget(category_id)
     
     updated_budget = await db.budgets.find_one({"categoryId": category_id})
     return Budget(**serialize_doc(updated_budget))
@@ -433,38 +962,398 @@ async def delete_budget(category_id: int):
     result = await db.budgets.delete_one({"categoryId": category_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Budget not found")
+    await collections_changed("budgets", events=diff_events("budgets", [({"categoryId": category_id}, None)], key="categoryId"))
+    alerts.touch_budget(category_id)
     return {"message": "Budget deleted successfully"}
 
 # === DASHBOARD ENDPOINTS ===
 
+def kpi_pipeline(match: dict, amount: str, count) -> list:
+    # Income, expenses and status counts in a single $group; the same shape runs
+    # over rollups (pre-summed) or raw transactions (one row per document)
+    def completed_total(type_):
+        return {"$sum": {"$cond": [
+            {"$and": [{"$eq": ["$type", type_]}, {"$eq": ["$status", "completed"]}]}, amount, 0
+        ]}}
+    
+    def status_count(status):
+        return {"$sum": {"$cond": [{"$eq": ["$status", status]}, count, 0]}}
+    
+    return [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": None,
+                "income": completed_total("income"),
+                "expenses": completed_total("expense"),
+                "pending": status_count("pending"),
+                "overdue": status_count("overdue")
+            }
+        }
+    ]
+
 @api_router.get("/dashboard/kpis")
-async def get_dashboard_kpis():
-    # Calculate KPIs from transactions
-    completed_transactions = await db.transactions.find({"status": "completed"}).to_list(1000)
+async def get_dashboard_kpis(
+    from_date: Optional[str] = Query(None, alias="from", pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    to_date: Optional[str] = Query(None, alias="to", pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    accountId: Optional[int] = Query(None)
+):
+    try:
+        month_aligned = is_month_aligned(from_date, to_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date")
     
-    total_income = sum(t["amount"] for t in completed_transactions if t["type"] == "income")
-    total_expenses = sum(t["amount"] for t in completed_transactions if t["type"] == "expense")
-    balance = total_income - total_expenses
+    match = {}
+    if accountId is not None:
+        match["accountId"] = accountId
     
-    pending_count = await db.transactions.count_documents({"status": "pending"})
-    overdue_count = await db.transactions.count_documents({"status": "overdue"})
+    if month_aligned:
+        # Whole months (or no range): sum the rollups, a few documents per month
+        if from_date or to_date:
+            match["month"] = {}
+            if from_date:
+                match["month"]["$gte"] = from_date[:7]
+            if to_date:
+                match["month"]["$lte"] = to_date[:7]
+        pipeline = kpi_pipeline(match, "$total", "$count")
+        totals = await db[ROLLUPS_COLLECTION].aggregate(pipeline).to_list(1)
+    else:
+        # Day-level range: aggregate the matching transactions (inclusive bounds)
+        match["date"] = {}
+        if from_date:
+            match["date"]["$gte"] = from_date
+        if to_date:
+            match["date"]["$lte"] = to_date
+        pipeline = kpi_pipeline(match, "$amount", 1)
+        totals = await db.transactions.aggregate(pipeline).to_list(1)
+    totals = totals[0] if totals else {"income": 0, "expenses": 0, "pending": 0, "overdue": 0}
+    
+    total_income = totals["income"]
+    total_expenses = totals["expenses"]
+    balance = total_income - total_expenses
     
     return {
         "totalIncome": total_income,
         "totalExpenses": total_expenses,
         "balance": balance,
         "netProfit": max(balance, 0),
-        "pendingTransactions": pending_count,
-        "overdueTransactions": overdue_count
+        "pendingTransactions": totals["pending"],
+        "overdueTransactions": totals["overdue"]
     }
 
+def _chart(labels, datasets):
+    return {"labels": labels, "datasets": datasets}
+
 @api_router.get("/dashboard/charts")
-async def get_dashboard_charts():
-    # This would return chart data - simplified for now
+async def get_dashboard_charts(
+    days: int = Query(30, ge=1, le=366),
+    months: int = Query(12, ge=1, le=120),
+    top: int = Query(5, ge=1, le=50)
+):
+    # All transaction-derived series come out of a single $facet round trip;
+    # account balances are read from the (small) accounts collection concurrently.
+    pipeline = [
+        {"$match": {"status": "completed"}},
+        {
+            "$facet": {
+                # The last `days` calendar days all fall within the `days` most recent
+                # distinct dates, so this bounds the output without a second query.
+                "daily": [
+                    {
+                        "$group": {
+                            "_id": "$date",
+                            "income": {"$sum": {"$cond": [{"$eq": ["$type", "income"]}, "$amount", 0]}},
+                            "expense": {"$sum": {"$cond": [{"$eq": ["$type", "expense"]}, "$amount", 0]}}
+                        }
+                    },
+                    {"$sort": {"_id": -1}},
+                    {"$limit": days}
+                ],
+                "monthly": [
+                    {"$match": {"type": "expense"}},
+                    {"$group": {"_id": {"$substr": ["$date", 0, 7]}, "total": {"$sum": "$amount"}}},
+                    {"$sort": {"_id": -1}},
+                    {"$limit": months}
+                ],
+                "byCategory": [
+                    {"$match": {"type": "expense"}},
+                    {"$group": {"_id": "$categoryId", "name": {"$first": "$categoryName"}, "total": {"$sum": "$amount"}}},
+                    {"$match": {"total": {"$gt": 0}}},
+                    {
+                        "$lookup": {
+                            "from": "categories",
+                            "localField": "_id",
+                            "foreignField": "id",
+                            "as": "category"
+                        }
+                    },
+                    {"$sort": {"total": -1}}
+                ]
+            }
+        }
+    ]
+
+    facets, accounts = await asyncio.gather(
+        db.transactions.aggregate(pipeline).to_list(1),
+        db.accounts.find({}, {"_id": 0, "name": 1, "balance": 1}).to_list(1000)
+    )
+    facets = facets[0] if facets else {"daily": [], "monthly": [], "byCategory": []}
+
+    # Income vs expense: zero-filled daily window ending at the latest transaction date
+    daily = {row["_id"]: row for row in facets["daily"]}
+    latest = date.fromisoformat(max(daily)) if daily else date.today()
+    day_labels = [(latest - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+    income_expense_trend = _chart(day_labels, [
+        {"label": "Income", "data": [daily[d]["income"] if d in daily else 0 for d in day_labels]},
+        {"label": "Expenses", "data": [daily[d]["expense"] if d in daily else 0 for d in day_labels]}
+    ])
+
+    monthly = list(reversed(facets["monthly"]))
+    monthly_spending_trend = _chart(
+        [row["_id"] for row in monthly],
+        [{"label": "Monthly Spending", "data": [row["total"] for row in monthly]}]
+    )
+
+    categories = []
+    for row in facets["byCategory"]:
+        category = row["category"][0] if row["category"] else {}
+        categories.append({
+            "name": category.get("name", row["name"]),
+            "color": category.get("color", "#6b7280"),
+            "total": row["total"]
+        })
+    category_breakdown = _chart(
+        [c["name"] for c in categories],
+        [{"data": [c["total"] for c in categories], "backgroundColor": [c["color"] for c in categories]}]
+    )
+    top_categories = _chart(
+        [c["name"] for c in categories[:top]],
+        [{
+            "label": "Total Spent",
+            "data": [c["total"] for c in categories[:top]],
+            "backgroundColor": [c["color"] for c in categories[:top]]
+        }]
+    )
+
+    account_balances = _chart(
+        [a["name"] for a in accounts],
+        [{"label": "Balance", "data": [a["balance"] for a in accounts]}]
+    )
+
     return {
-        "message": "Chart data endpoint - implement based on frontend needs"
+        "incomeExpenseTrend": income_expense_trend,
+        "monthlySpendingTrend": monthly_spending_trend,
+        "categoryBreakdown": category_breakdown,
+        "accountBalances": account_balances,
+        "topCategories": top_categories
     }
 
+# === ANALYTICS ENDPOINTS ===
+
+@api_router.get("/analytics/timeseries")
+async def get_timeseries(
+    granularity: str = Query("month", pattern="^(day|week|month|quarter)$"),
+    metric: str = Query("expenses", pattern="^(income|expenses|net|count)$"),
+    groupBy: Optional[str] = Query(None, pattern="^(category|account)$"),
+    from_date: Optional[str] = Query(None, alias="from", pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    to_date: Optional[str] = Query(None, alias="to", pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    status: str = Query("completed"),
+    accountId: Optional[int] = Query(None),
+    categoryId: Optional[int] = Query(None),
+    source: str = Query("auto", pattern="^(auto|ledger)$")
+):
+    filters = {}
+    if status != "all":
+        filters["status"] = status
+    if accountId is not None:
+        filters["accountId"] = accountId
+    if categoryId is not None:
+        filters["categoryId"] = categoryId
+    
+    try:
+        return await timeseries(db, granularity, metric, groupBy, from_date, to_date, filters, source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# === ALERTS ENDPOINTS ===
+
+@api_router.get("/alerts")
+async def get_alerts(
+    status: str = Query("active", pattern="^(active|resolved|all)$"),
+    kind: Optional[str] = Query(None, pattern="^(lowBalance|budgetOverrun)$"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    return await list_alerts(db, status, kind, limit)
+
+@api_router.get("/alerts/stream")
+async def stream_alerts():
+    # Server-Sent Events: the active alerts, then every raise/update/resolve from any worker
+    return StreamingResponse(
+        alerts.event_stream(db),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.post("/alerts/evaluate")
+async def evaluate_alerts():
+    # Full re-evaluation now, e.g. after changing thresholds directly in the database
+    await alerts.evaluate_all(db)
+    return {"active": await db[ALERTS_COLLECTION].count_documents({"status": "active"})}
+
+# === CHANGE FEED ENDPOINTS ===
+
+@api_router.get("/stream")
+async def stream_changes(
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID"),
+    resume_from: Optional[int] = Query(None, alias="lastEventId")
+):
+    # Server-Sent Events: entity diffs from every write handler. EventSource resends the last
+    # id as a header when it reconnects; ?lastEventId= resumes a new EventSource the same way
+    return StreamingResponse(
+        feed.event_stream(db, last_event_id if last_event_id is not None else resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# === BATCH ENDPOINTS ===
+
+async def run_batch(collection: str, request: BatchRequest, model, **options):
+    if len(request.operations) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"A batch can hold at most {MAX_BATCH_SIZE} operations")
+    return await execute_batch(db, collection, request, model, **options)
+
+async def reference_batch(collection: str, request: BatchRequest, model, prepare=None, updater=None):
+    response, applied = await run_batch(
+        collection, request, model, allocator=id_allocator, prepare=prepare, updater=updater
+    )
+    if applied:
+        await collections_changed(collection, events=diff_events(collection, applied))
+    for old, new in applied:
+        if old and new and old["name"] != new["name"]:
+            await propagator.enqueue(db, collection, new["id"], new["name"])
+    return response
+
+@api_router.post("/categories/batch")
+async def batch_categories(request: BatchRequest):
+    return await reference_batch("categories", request, CategoryCreate)
+
+@api_router.post("/accounts/batch")
+async def batch_accounts(request: BatchRequest):
+    def prepare(account: dict, old: Optional[dict]) -> dict:
+        # Balances follow the ledger, as in create_account/update_account
+        balance, opening = account.pop("balance"), account.pop("openingBalance")
+        if old is None and balance is None and opening is None:
+            raise ValueError(BALANCE_REQUIRED)
+        if old is not None and balance is not None:
+            raise ValueError(BALANCE_READ_ONLY)
+        if old is None:
+            account["balance"] = account["openingBalance"] = balance if opening is None else opening
+        elif opening is not None:
+            # Tracked for the change events; the write itself shifts the stored balance (updater)
+            account["balance"] = old["balance"] + opening - old.get("openingBalance", opening)
+            account["openingBalance"] = opening
+        return account
+    
+    def updater(account: dict) -> list:
+        fields = {field: value for field, value in account.items() if field not in ("balance", "openingBalance")}
+        return account_update(fields, account.get("openingBalance"))
+    
+    response = await reference_batch("accounts", request, AccountCreate, prepare=prepare, updater=updater)
+    for result in response["results"]:
+        if result.get("id") is not None:
+            alerts.touch_account(result["id"])
+    return response
+
+@api_router.post("/clients/batch")
+async def batch_clients(request: BatchRequest):
+    return await reference_batch("clients", request, ClientCreate)
+
+@api_router.post("/vendors/batch")
+async def batch_vendors(request: BatchRequest):
+    return await reference_batch("vendors", request, VendorCreate)
+
+@api_router.post("/transactions/batch")
+async def batch_transactions(request: BatchRequest):
+    # Names resolve against maps loaded once for the whole batch
+    maps = await load_reference_maps(db)
+    
+    def prepare(transaction: dict, old: Optional[dict]) -> dict:
+        transaction.update(maps.names(transaction))
+        transaction[TERMS_FIELD] = search_terms(transaction)
+        return transaction
+    
+    response, applied = await run_batch("transactions", request, TransactionCreate, allocator=id_allocator, prepare=prepare)
+    removed = [old for old, _ in applied if old]
+    added = [new for _, new in applied if new]
+    await apply_transactions(db, removed, sign=-1)
+    await apply_transactions(db, added)
+    # Sequential, so each account's latest balance is the one after both
+    balances = await apply_balances(db, removed, sign=-1)
+    balances.update(await apply_balances(db, added))
+    events = diff_events("transactions", applied)
+    if balances:
+        events += balance_events(balances)
+        await collections_changed("transactions", "accounts", events=events)
+    elif applied:
+        await collections_changed("transactions", events=events)
+    alerts.touch_transactions(removed + added)
+    return response
+
+@api_router.post("/budgets/batch")
+async def batch_budgets(request: BatchRequest):
+    # Budgets are keyed by categoryId, so update/delete operations carry it as their id
+    categories = {category["id"]: category for category in await cached_collection("categories", WRITE_NAMES_MAX_AGE)}
+    
+    def prepare(budget: dict, old: Optional[dict]) -> dict:
+        category = categories.get(budget["categoryId"])
+        if category is None:
+            raise ValueError("Category not found")
+        budget["categoryName"] = category["name"]
+        return budget
+    
+    response, applied = await run_batch("budgets", request, BudgetCreate, key="categoryId", prepare=prepare)
+    if applied:
+        await collections_changed("budgets", events=diff_events("budgets", applied, key="categoryId"))
+    for old, new in applied:
+        alerts.touch_budget((new or old)["categoryId"])
+    return response
+
+# === HEALTH & DIAGNOSTICS ENDPOINTS ===
+
+@api_router.get("/health")
+async def get_health():
+    try:
+        await db.command("ping")
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Database unavailable: {e}")
+    
+    indexes = await index_report(db)
+    return {
+        "status": indexes["status"],
+        "database": "ok",
+        "indexes": indexes
+    }
+
+@api_router.get("/propagation/jobs")
+async def get_propagation_jobs(
+    status: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=1000)
+):
+    query = {"status": status} if status else {}
+    jobs = await db[JOBS_COLLECTION].find(query).sort("createdAt", -1).limit(limit).to_list(limit)
+    for job in jobs:
+        job["id"] = str(job.pop("_id"))
+    return jobs
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    return ref_cache.stats()
+
+# Prometheus scrapes the conventional path, outside /api
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -474,15 +1363,15 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Added last so it is outermost and times the whole stack, CORS included
+app.add_middleware(MetricsMiddleware, profiler=profiler)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
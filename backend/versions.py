@@ -0,0 +1,41 @@
+"""
+Per-collection version counters for conditional GETs
+Every write handler bumps the versions of the collections it changed. List
+endpoints derive their ETag from the versions they depend on, so a client
+revalidating an unchanged list gets a 304 without the list being read or sent.
+The counters live in MongoDB, so every worker agrees on them.
+"""
+
+from typing import Dict, Iterable
+
+from pymongo import UpdateOne
+
+VERSIONS_COLLECTION = "collection_versions"
+
+
+async def bump_versions(db, collections: Iterable[str]):
+    operations = [
+        UpdateOne({"_id": collection}, {"$inc": {"version": 1}}, upsert=True)
+        for collection in collections
+    ]
+    if operations:
+        await db[VERSIONS_COLLECTION].bulk_write(operations, ordered=False)
+
+
+async def get_versions(db, collections: Iterable[str]) -> Dict[str, int]:
+    """Current version of each collection; never-written collections are at 0"""
+    collections = list(collections)
+    versions = dict.fromkeys(collections, 0)
+    async for doc in db[VERSIONS_COLLECTION].find({"_id": {"$in": collections}}):
+        versions[doc["_id"]] = doc["version"]
+    return versions
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match comparison (weak, per RFC 9110): any listed tag or '*'"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
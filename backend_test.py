@@ -158,12 +158,13 @@ class APITester:
         updated_account = {
             "name": "Updated Business Checking",
             "type": "checking",
-            "balance": 16000.75,
+            "openingBalance": 16000.75,
             "lowBalanceThreshold": 1200.0
         }
         
+        # The balance follows the ledger; with no transactions it equals the opening balance
         success, data, status_code = self.make_request("PUT", f"/accounts/{account_id}", updated_account)
-        if success and data.get('balance') == updated_account['balance']:
+        if success and data.get('balance') == updated_account['openingBalance']:
             self.log_test("PUT Accounts", True, f"Updated account ID: {account_id}")
             return data
         else:
@@ -14,6 +14,7 @@ const Accounts = () => {
       id: Math.max(...accounts.map(a => a.id)) + 1,
       ...accountData,
       balance: parseFloat(accountData.balance),
+      openingBalance: parseFloat(accountData.balance),
       lowBalanceThreshold: parseFloat(accountData.lowBalanceThreshold)
     };
     setAccounts([...accounts, newAccount]);
@@ -21,12 +22,16 @@ const Accounts = () => {
   };
 
   const handleEditAccount = (accountData) => {
+    // The balance follows the transactions; a new opening balance shifts it by the difference
+    const { balance, ...changes } = accountData;
+    const openingBalance = parseFloat(changes.openingBalance);
     setAccounts(accounts.map(a => 
       a.id === editingAccount.id 
         ? { 
             ...a, 
-            ...accountData, 
-            balance: parseFloat(accountData.balance),
+            ...changes, 
+            openingBalance,
+            balance: a.balance + openingBalance - (a.openingBalance ?? a.balance),
             lowBalanceThreshold: parseFloat(accountData.lowBalanceThreshold)
           } 
         : a
@@ -205,6 +210,7 @@ const AccountModal = ({ account, isOpen, onClose, onSave }) => {
     name: account?.name || '',
     type: account?.type || 'checking',
     balance: account?.balance || '',
+    openingBalance: account?.openingBalance ?? account?.balance ?? '',
     lowBalanceThreshold: account?.lowBalanceThreshold || ''
   });
 
@@ -257,18 +263,36 @@ const AccountModal = ({ account, isOpen, onClose, onSave }) => {
             </select>
           </div>
 
-          <div>
-            <label className="block text-sm font-medium text-[var(--text-primary)] mb-2">Current Balance</label>
-            <input
-              type="number"
-              step="0.01"
-              value={formData.balance}
-              onChange={(e) => setFormData({...formData, balance: e.target.value})}
-              className="w-full px-3 py-2 border border-[var(--border-color)] rounded-lg bg-[var(--bg-secondary)] text-[var(--text-primary)] focus:ring-2 focus:ring-[var(--color-primary)] focus:border-transparent"
-              required
-              placeholder="0.00"
-            />
-          </div>
+          {account ? (
+            <div>
+              <label className="block text-sm font-medium text-[var(--text-primary)] mb-2">Opening Balance</label>
+              <input
+                type="number"
+                step="0.01"
+                value={formData.openingBalance}
+                onChange={(e) => setFormData({...formData, openingBalance: e.target.value})}
+                className="w-full px-3 py-2 border border-[var(--border-color)] rounded-lg bg-[var(--bg-secondary)] text-[var(--text-primary)] focus:ring-2 focus:ring-[var(--color-primary)] focus:border-transparent"
+                required
+                placeholder="0.00"
+              />
+              <p className="text-xs text-[var(--text-secondary)] mt-1">
+                The current balance follows your transactions; changing this shifts it by the difference
+              </p>
+            </div>
+          ) : (
+            <div>
+              <label className="block text-sm font-medium text-[var(--text-primary)] mb-2">Current Balance</label>
+              <input
+                type="number"
+                step="0.01"
+                value={formData.balance}
+                onChange={(e) => setFormData({...formData, balance: e.target.value})}
+                className="w-full px-3 py-2 border border-[var(--border-color)] rounded-lg bg-[var(--bg-secondary)] text-[var(--text-primary)] focus:ring-2 focus:ring-[var(--color-primary)] focus:border-transparent"
+                required
+                placeholder="0.00"
+              />
+            </div>
+          )}
 
           <div>
             <label className="block text-sm font-medium text-[var(--text-primary)] mb-2">Low Balance Threshold</label>
@@ -1,12 +1,15 @@
 import React, { useState } from 'react';
 import { Plus, Edit, Trash2, TrendingUp, TrendingDown, Loader2 } from 'lucide-react';
 import { categoriesAPI } from '../services/api';
-import { useApi, useApiMutation } from '../hooks/useApi';
+import { useApi, useApiMutation, useChangeFeed } from '../hooks/useApi';
 import { useToast } from '../hooks/use-toast';
 
 const Categories = () => {
   const { toast } = useToast();
-  const { data: categories, loading, error, refetch } = useApi(() => categoriesAPI.getAll());
+  const categoriesQuery = useApi(() => categoriesAPI.getAll());
+  const { data: categories, loading, error, refetch } = categoriesQuery;
+  // Creates, edits and deletes (from any tab or user) arrive over /api/stream
+  useChangeFeed('categories', categoriesQuery);
   const { mutate, loading: mutationLoading } = useApiMutation();
   const [isAddModalOpen, setIsAddModalOpen] = useState(false);
   const [editingCategory, setEditingCategory] = useState(null);
@@ -15,7 +18,6 @@ const Categories = () => {
     const result = await mutate(categoriesAPI.create, categoryData);
     if (result.success) {
       toast({ title: "Success", description: "Category created successfully" });
-      refetch();
       setIsAddModalOpen(false);
     } else {
       toast({ title: "Error", description: result.error.message, variant: "destructive" });
@@ -26,7 +28,6 @@ const Categories = () => {
     const result = await mutate(categoriesAPI.update, editingCategory.id, categoryData);
     if (result.success) {
       toast({ title: "Success", description: "Category updated successfully" });
-      refetch();
       setEditingCategory(null);
     } else {
       toast({ title: "Error", description: result.error.message, variant: "destructive" });
@@ -38,7 +39,6 @@ const Categories = () => {
       const result = await mutate(categoriesAPI.delete, id);
       if (result.success) {
         toast({ title: "Success", description: "Category deleted successfully" });
-        refetch();
       } else {
         toast({ title: "Error", description: result.error.message, variant: "destructive" });
       }
@@ -23,9 +23,9 @@ import {
   BarElement,
 } from 'chart.js';
 import { useTheme } from '../contexts/ThemeContext';
-import { dashboardAPI, transactionsAPI, accountsAPI, categoriesAPI } from '../services/api';
+import { dashboardAPI, transactionsAPI } from '../services/api';
 import { useApi } from '../hooks/useApi';
-import { format, parseISO, subDays, startOfMonth, endOfMonth, eachMonthOfInterval, subMonths } from 'date-fns';
+import { format, parseISO } from 'date-fns';
 
 ChartJS.register(
   CategoryScale,
@@ -44,20 +44,21 @@ const Dashboard = () => {
   
   // Fetch data from API
   const { data: kpis, loading: kpisLoading, error: kpisError, refetch: refetchKpis } = useApi(() => dashboardAPI.getKPIs());
-  const { data: transactions, loading: transactionsLoading, refetch: refetchTransactions } = useApi(() => transactionsAPI.getAll());
-  const { data: accounts, loading: accountsLoading, refetch: refetchAccounts } = useApi(() => accountsAPI.getAll());
-  const { data: categories, loading: categoriesLoading, refetch: refetchCategories } = useApi(() => categoriesAPI.getAll());
+  const { data: transactions, loading: transactionsLoading, refetch: refetchTransactions } = useApi(() => transactionsAPI.getAll({
+    limit: 5,
+    fields: ['date', 'type', 'amount', 'categoryName', 'accountName', 'status']
+  }));
+  const { data: charts, loading: chartsLoading, refetch: refetchCharts } = useApi(() => dashboardAPI.getCharts());
 
   // Refresh all data
   const refreshDashboard = () => {
     refetchKpis();
     refetchTransactions();
-    refetchAccounts();
-    refetchCategories();
+    refetchCharts();
   };
 
   // Loading state
-  if (kpisLoading || transactionsLoading || accountsLoading || categoriesLoading) {
+  if (kpisLoading || transactionsLoading || chartsLoading) {
     return (
       <div className="flex items-center justify-center min-h-64">
         <Loader2 className="animate-spin text-[var(--color-primary)]" size={32} />
@@ -77,8 +78,6 @@ const Dashboard = () => {
 
   // Use API data or fallback to empty arrays
   const safeTransactions = transactions || [];
-  const safeAccounts = accounts || [];
-  const safeCategories = categories || [];
 
   // Debug: Log transaction data to understand format
   if (safeTransactions.length > 0) {
@@ -104,49 +103,25 @@ const Dashboard = () => {
   // Recent transactions (5 most recent)
   const recentTransactions = safeTransactions.slice(0, 5);
 
-  // Chart data preparation - Use actual transaction date range
-  const transactionDates = safeTransactions.map(t => t.date).filter(Boolean).sort();
-  const earliestDate = transactionDates.length > 0 ? parseISO(transactionDates[0]) : subDays(new Date(), 29);
-  const latestDate = transactionDates.length > 0 ? parseISO(transactionDates[transactionDates.length - 1]) : new Date();
-  
-  // Create date range from earliest to latest transaction date, or show last 30 days if no transactions
-  const daysDiff = Math.max(30, Math.ceil((latestDate - earliestDate) / (1000 * 60 * 60 * 24)) + 1);
-  const dateRange = Array.from({ length: Math.min(daysDiff, 30) }, (_, i) => {
-    const date = subDays(latestDate, Math.min(daysDiff, 30) - 1 - i);
-    return format(date, 'yyyy-MM-dd');
-  });
-
-  // Group transactions by date for better performance
-  const transactionsByDate = safeTransactions.reduce((acc, transaction) => {
-    const date = transaction.date;
-    if (!acc[date]) {
-      acc[date] = { income: 0, expense: 0 };
-    }
-    if (transaction.status === 'completed') {
-      if (transaction.type === 'income') {
-        acc[date].income += transaction.amount;
-      } else if (transaction.type === 'expense') {
-        acc[date].expense += transaction.amount;
-      }
-    }
-    return acc;
-  }, {});
-
-  console.log('Transactions by date:', transactionsByDate);
+  // Chart series are aggregated server-side; only styling is applied here
+  const emptyChart = { labels: [], datasets: [] };
+  const trend = charts?.incomeExpenseTrend || emptyChart;
+  const monthly = charts?.monthlySpendingTrend || emptyChart;
+  const breakdown = charts?.categoryBreakdown || emptyChart;
+  const balances = charts?.accountBalances || emptyChart;
+  const top = charts?.topCategories || emptyChart;
 
   const incomeExpenseData = {
-    labels: dateRange.map(date => format(parseISO(date), 'MMM dd')),
+    labels: trend.labels.map(date => format(parseISO(date), 'MMM dd')),
     datasets: [
       {
-        label: 'Income',
-        data: dateRange.map(date => transactionsByDate[date]?.income || 0),
+        ...trend.datasets[0],
         borderColor: 'var(--color-success)',
         backgroundColor: 'rgba(16, 185, 129, 0.1)',
         tension: 0.4,
       },
       {
-        label: 'Expenses',
-        data: dateRange.map(date => transactionsByDate[date]?.expense || 0),
+        ...trend.datasets[1],
         borderColor: '#ef4444',
         backgroundColor: 'rgba(239, 68, 68, 0.1)',
         tension: 0.4,
@@ -155,111 +130,40 @@ const Dashboard = () => {
   };
 
   // Category breakdown for doughnut chart
-  const expensesByCategory = safeCategories
-    .filter(c => c.type === 'expense')
-    .map(category => ({
-      ...category,
-      amount: safeTransactions
-        .filter(t => t.type === 'expense' && t.categoryId === category.id && t.status === 'completed')
-        .reduce((sum, t) => sum + t.amount, 0)
-    }))
-    .filter(c => c.amount > 0);
-
   const categoryData = {
-    labels: expensesByCategory.map(c => c.name),
-    datasets: [
-      {
-        data: expensesByCategory.map(c => c.amount),
-        backgroundColor: expensesByCategory.map(c => c.color),
-        borderWidth: 0,
-      },
-    ],
+    labels: breakdown.labels,
+    datasets: breakdown.datasets.map(dataset => ({ ...dataset, borderWidth: 0 })),
   };
 
   // Account balances for bar chart
   const accountData = {
-    labels: safeAccounts.map(a => a.name),
-    datasets: [
-      {
-        label: 'Balance',
-        data: safeAccounts.map(a => a.balance),
-        backgroundColor: safeAccounts.map(a => 
-          a.balance > 0 ? 'var(--color-success)' : '#ef4444'
-        ),
-        borderRadius: 8,
-      },
-    ],
+    labels: balances.labels,
+    datasets: balances.datasets.map(dataset => ({
+      ...dataset,
+      backgroundColor: dataset.data.map(balance =>
+        balance > 0 ? 'var(--color-success)' : '#ef4444'
+      ),
+      borderRadius: 8,
+    })),
   };
 
-  // Monthly spending trend - Use actual transaction months
-  const monthlyTrendData = (() => {
-    // Get unique months from transactions
-    const transactionMonths = [...new Set(safeTransactions.map(t => t.date.substring(0, 7)))].sort();
-    const months = transactionMonths.length > 0 
-      ? transactionMonths.map(monthStr => parseISO(monthStr + '-01'))
-      : eachMonthOfInterval({
-          start: subMonths(new Date(), 5),
-          end: new Date()
-        });
-
-    // Group transactions by month-year
-    const transactionsByMonth = safeTransactions.reduce((acc, transaction) => {
-      if (transaction.type === 'expense' && transaction.status === 'completed') {
-        const monthYear = transaction.date.substring(0, 7); // Extract YYYY-MM
-        if (!acc[monthYear]) {
-          acc[monthYear] = 0;
-        }
-        acc[monthYear] += transaction.amount;
-      }
-      return acc;
-    }, {});
-
-    console.log('Transactions by month:', transactionsByMonth);
-
-    return {
-      labels: months.map(month => format(month, 'MMM yyyy')),
-      datasets: [
-        {
-          label: 'Monthly Spending',
-          data: months.map(month => {
-            const monthYear = format(month, 'yyyy-MM');
-            return transactionsByMonth[monthYear] || 0;
-          }),
-          borderColor: '#ef4444',
-          backgroundColor: 'rgba(239, 68, 68, 0.1)',
-          tension: 0.4,
-          fill: true,
-        },
-      ],
-    };
-  })();
+  // Monthly spending trend
+  const monthlyTrendData = {
+    labels: monthly.labels.map(month => format(parseISO(month + '-01'), 'MMM yyyy')),
+    datasets: monthly.datasets.map(dataset => ({
+      ...dataset,
+      borderColor: '#ef4444',
+      backgroundColor: 'rgba(239, 68, 68, 0.1)',
+      tension: 0.4,
+      fill: true,
+    })),
+  };
 
   // Top expense categories (horizontal bar)
-  const topCategoriesData = (() => {
-    const categoryTotals = safeCategories
-      .filter(c => c.type === 'expense')
-      .map(category => ({
-        ...category,
-        total: safeTransactions
-          .filter(t => t.type === 'expense' && t.categoryId === category.id && t.status === 'completed')
-          .reduce((sum, t) => sum + t.amount, 0)
-      }))
-      .filter(c => c.total > 0)
-      .sort((a, b) => b.total - a.total)
-      .slice(0, 5);
-
-    return {
-      labels: categoryTotals.map(c => c.name),
-      datasets: [
-        {
-          label: 'Total Spent',
-          data: categoryTotals.map(c => c.total),
-          backgroundColor: categoryTotals.map(c => c.color),
-          borderRadius: 4,
-        },
-      ],
-    };
-  })();
+  const topCategoriesData = {
+    labels: top.labels,
+    datasets: top.datasets.map(dataset => ({ ...dataset, borderRadius: 4 })),
+  };
 
   const chartOptions = {
     responsive: true,
@@ -329,13 +233,13 @@ const Dashboard = () => {
           <h1 className="text-2xl font-bold text-[var(--text-primary)]">Dashboard</h1>
           <button
             onClick={refreshDashboard}
-            disabled={kpisLoading || transactionsLoading || accountsLoading || categoriesLoading}
+            disabled={kpisLoading || transactionsLoading || chartsLoading}
             className="flex items-center space-x-1 px-3 py-1.5 text-sm bg-[var(--bg-tertiary)] hover:bg-[var(--border-color)] text-[var(--text-secondary)] hover:text-[var(--text-primary)] rounded-lg transition-colors disabled:opacity-50"
             title="Refresh all charts and data"
           >
             <RefreshCw 
               size={16} 
-              className={`${(kpisLoading || transactionsLoading || accountsLoading || categoriesLoading) ? 'animate-spin' : ''}`} 
+              className={`${(kpisLoading || transactionsLoading || chartsLoading) ? 'animate-spin' : ''}`} 
             />
             <span>Refresh</span>
           </button>
@@ -1,5 +1,5 @@
 import { useState, useEffect, useCallback } from 'react';
-import { handleApiError } from '../services/api';
+import { handleApiError, streamAPI } from '../services/api';
 
 export const useApi = (apiFunction, dependencies = []) => {
   const [data, setData] = useState(null);
@@ -28,7 +28,7 @@ export const useApi = (apiFunction, dependencies = []) => {
     fetchData();
   }, [fetchData]);
 
-  return { data, loading, error, refetch };
+  return { data, loading, error, refetch, setData };
 };
 
 export const useApiMutation = () => {
@@ -53,4 +53,31 @@ export const useApiMutation = () => {
   return { mutate, loading, error, setError };
 };
 
+// Applies one /api/stream change event to a list of entities
+export const applyChange = (items, change, key = 'id') => {
+  if (!Array.isArray(items)) return items;
+  switch (change.op) {
+    case 'create':
+      return [...items.filter((item) => item[key] !== change.id), change.data];
+    case 'update':
+      return items.map((item) => (item[key] === change.id ? { ...item, ...change.data } : item));
+    case 'delete':
+      return items.filter((item) => item[key] !== change.id);
+    default:
+      return items;
+  }
+};
+
+// Keeps a useApi list current from the change feed instead of refetching after every write;
+// reloads it when the feed says the list can no longer be patched
+export const useChangeFeed = (collection, { setData, refetch }, key = 'id') => {
+  useEffect(() => streamAPI.subscribe((type, change) => {
+    if (type === 'reset' || (change.collection === collection && change.op === 'reset')) {
+      refetch();
+    } else if (type === 'change' && change.collection === collection) {
+      setData((items) => applyChange(items, change, key));
+    }
+  }), [collection, setData, refetch, key]);
+};
+
 export default useApi;
\ No newline at end of file
@@ -50,6 +50,9 @@ export const accountsAPI = {
   create: (data) => api.post('/accounts', data),
   update: (id, data) => api.put(`/accounts/${id}`, data),
   delete: (id) => api.delete(`/accounts/${id}`),
+  getBalances: (date) => api.get('/accounts/balances', { params: date ? { date } : {} }),
+  getBalanceHistory: (id, params = {}) => api.get(`/accounts/${id}/balance-history`, { params }),
+  reconcile: (dryRun = false) => api.post('/accounts/reconcile', null, { params: { dryRun } }),
 };
 
 // === Transactions API ===
@@ -59,6 +62,15 @@ export const transactionsAPI = {
     if (params.type && params.type !== 'all') queryParams.append('type', params.type);
     if (params.status && params.status !== 'all') queryParams.append('status', params.status);
     if (params.search) queryParams.append('search', params.search);
+    if (params.searchMode) queryParams.append('searchMode', params.searchMode);
+    if (params.from) queryParams.append('from', params.from);
+    if (params.to) queryParams.append('to', params.to);
+    ['accountId', 'categoryId', 'clientVendorId', 'minAmount', 'maxAmount'].forEach((key) => {
+      if (params[key] !== undefined && params[key] !== null && params[key] !== '') queryParams.append(key, params[key]);
+    });
+    if (params.limit) queryParams.append('limit', params.limit);
+    if (params.cursor) queryParams.append('cursor', params.cursor);
+    if (params.fields) queryParams.append('fields', [].concat(params.fields).join(','));
     
     const queryString = queryParams.toString();
     return api.get(`/transactions${queryString ? `?${queryString}` : ''}`);
@@ -102,6 +114,55 @@ export const dashboardAPI = {
   getCharts: () => api.get('/dashboard/charts'),
 };
 
+// === Analytics API ===
+export const analyticsAPI = {
+  // params: granularity, metric, groupBy, from, to, status, accountId, categoryId
+  getTimeseries: (params = {}) => api.get('/analytics/timeseries', { params }),
+};
+
+// === Alerts API ===
+export const alertsAPI = {
+  // params: status (active|resolved|all), kind, limit
+  getAll: (params = {}) => api.get('/alerts', { params }),
+  evaluate: () => api.post('/alerts/evaluate'),
+  // onEvent('snapshot', alerts[]) first, then onEvent('alert', { change, alert }); returns an unsubscribe function
+  subscribe: (onEvent) => {
+    const source = new EventSource(`${API_BASE}/alerts/stream`);
+    ['snapshot', 'alert'].forEach((type) =>
+      source.addEventListener(type, (event) => onEvent(type, JSON.parse(event.data)))
+    );
+    return () => source.close();
+  },
+};
+
+// === Change Feed ===
+// One EventSource on /api/stream shared by every subscriber; it reconnects and resumes by itself
+const feedListeners = new Set();
+let feedSource = null;
+
+export const streamAPI = {
+  // onEvent(type, payload) for 'ready', 'change' and 'reset' events; returns an unsubscribe function
+  subscribe: (onEvent) => {
+    feedListeners.add(onEvent);
+    if (!feedSource) {
+      feedSource = new EventSource(`${API_BASE}/stream`);
+      ['ready', 'change', 'reset'].forEach((type) =>
+        feedSource.addEventListener(type, (event) => {
+          const payload = JSON.parse(event.data);
+          feedListeners.forEach((listener) => listener(type, payload));
+        })
+      );
+    }
+    return () => {
+      feedListeners.delete(onEvent);
+      if (feedListeners.size === 0 && feedSource) {
+        feedSource.close();
+        feedSource = null;
+      }
+    };
+  },
+};
+
 // === Utility Functions ===
 export const handleApiError = (error) => {
   if (error.response) {
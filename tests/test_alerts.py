@@ -0,0 +1,45 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from alerts import ALERTS_COLLECTION, BUDGET_OVERRUN, LOW_BALANCE, AlertEngine
+from changes import CHANGES_COLLECTION, ChangeFeed
+from rollups import apply_transactions
+
+
+async def transitions(db):
+    events = await db[CHANGES_COLLECTION].find({}, {"_id": 0}).sort("seq", 1).to_list(None)
+    return [(event["change"], event["data"]["kind"], event["data"]["value"]) for event in events]
+
+
+def test_low_balance_is_raised_updated_and_resolved_once_each():
+    async def scenario():
+        db = AsyncMongoMockClient()["alerts_test"]
+        engine = AlertEngine(ChangeFeed())
+        await db.accounts.insert_one({"id": 1, "name": "Checking", "balance": 80.0, "lowBalanceThreshold": 100.0})
+        for balance in (80.0, 60.0, 60.0, 150.0, 150.0):
+            await db.accounts.update_one({"id": 1}, {"$set": {"balance": balance}})
+            await engine.evaluate(db, {1}, set())
+        alerts = await db[ALERTS_COLLECTION].find({}, {"_id": 0, "status": 1}).to_list(None)
+        return await transitions(db), alerts
+
+    events, alerts = asyncio.run(scenario())
+    # Re-evaluating without a change records nothing
+    assert events == [("raised", LOW_BALANCE, 80.0), ("updated", LOW_BALANCE, 60.0), ("resolved", LOW_BALANCE, 150.0)]
+    assert alerts == [{"status": "resolved"}]
+
+
+def test_budget_overrun_follows_the_month_rollup():
+    async def scenario():
+        db = AsyncMongoMockClient()["alerts_test"]
+        engine = AlertEngine(ChangeFeed())
+        await db.budgets.insert_one({"categoryId": 3, "categoryName": "Travel", "monthlyBudget": 100.0})
+        trip = {"id": 1, "date": "2024-05-02", "type": "expense", "amount": 120.0,
+                "categoryId": 3, "accountId": 1, "status": "completed"}
+        await apply_transactions(db, [trip])
+        await engine.evaluate(db, set(), {(3, "2024-05"), (3, "2024-06")})
+        await apply_transactions(db, [trip], sign=-1)
+        await engine.evaluate(db, set(), {(3, "2024-05")})
+        return await transitions(db)
+
+    assert asyncio.run(scenario()) == [("raised", BUDGET_OVERRUN, 120.0), ("resolved", BUDGET_OVERRUN, 0)]
@@ -0,0 +1,39 @@
+from datetime import date, timedelta
+
+import pytest
+
+from analytics import MAX_PERIODS, add_periods, period_range
+
+
+@pytest.mark.parametrize("start, granularity, count, expected", [
+    (date(2024, 1, 31), "day", 1, date(2024, 2, 1)),
+    (date(2024, 1, 1), "week", -1, date(2023, 12, 25)),
+    (date(2024, 11, 1), "month", 2, date(2025, 1, 1)),
+    (date(2024, 1, 1), "month", -1, date(2023, 12, 1)),
+    (date(2024, 10, 1), "quarter", 1, date(2025, 1, 1)),
+    (date(2024, 1, 1), "quarter", -5, date(2022, 10, 1)),
+])
+def test_add_periods(start, granularity, count, expected):
+    assert add_periods(start, granularity, count) == expected
+
+
+def test_period_range_starts_at_the_period_containing_first():
+    assert period_range(date(2024, 1, 17), date(2024, 3, 1), "month") == [
+        date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1)
+    ]
+    # 2024-01-03 is a Wednesday
+    assert period_range(date(2024, 1, 3), date(2024, 1, 15), "week") == [
+        date(2024, 1, 1), date(2024, 1, 8), date(2024, 1, 15)
+    ]
+    assert period_range(date(2024, 2, 15), date(2024, 12, 31), "quarter") == [
+        date(2024, 1, 1), date(2024, 4, 1), date(2024, 7, 1), date(2024, 10, 1)
+    ]
+
+
+def test_period_range_is_empty_when_reversed():
+    assert period_range(date(2024, 3, 2), date(2024, 3, 1), "day") == []
+
+
+def test_period_range_refuses_oversized_ranges():
+    with pytest.raises(ValueError, match="more than"):
+        period_range(date(2000, 1, 1), date(2000, 1, 1) + timedelta(days=MAX_PERIODS + 1), "day")
@@ -0,0 +1,88 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from balances import (
+    BALANCE_DAYS_COLLECTION, apply_balance_change, balance_delta, balances_at, reconcile_balances
+)
+
+
+def transaction(id, date="2024-05-10", type="expense", amount=10.0, accountId=1, status="completed"):
+    return {"id": id, "date": date, "type": type, "amount": amount, "accountId": accountId, "status": status}
+
+
+async def ledger(accounts):
+    db = AsyncMongoMockClient()["balances_test"]
+    await db.accounts.insert_many([
+        {"id": id, "name": f"Account {id}", "balance": opening, "openingBalance": opening}
+        for id, opening in accounts.items()
+    ])
+    return db
+
+
+async def write(db, old=None, new=None):
+    # What the transaction handlers do: the ledger write, then the balance delta
+    if old:
+        await db.transactions.delete_one({"id": old["id"]})
+    if new:
+        await db.transactions.insert_one(dict(new))
+    return await apply_balance_change(db, old=old, new=new)
+
+
+async def days(db):
+    docs = await db[BALANCE_DAYS_COLLECTION].find({}, {"_id": 0}).to_list(None)
+    return sorted((doc["accountId"], doc["date"], round(doc["delta"], 2), doc["count"]) for doc in docs if doc["count"])
+
+
+def test_balance_delta_counts_completed_transactions_only():
+    assert balance_delta(transaction(1, type="income", amount=40)) == 40
+    assert balance_delta(transaction(1, amount=40)) == -40
+    assert balance_delta(transaction(1, amount=40, status="pending")) == 0
+
+
+def test_updates_and_deletes_move_balances_and_days():
+    async def scenario():
+        db = await ledger({1: 100.0, 2: 0.0})
+        steps = []
+        salary = transaction(1, type="income", amount=50, status="pending")
+        steps.append(await write(db, new=salary))
+        completed = {**salary, "status": "completed"}
+        steps.append(await write(db, salary, completed))
+        moved = {**completed, "accountId": 2, "date": "2024-05-11"}
+        steps.append(await write(db, completed, moved))
+        rent = transaction(2, amount=30)
+        steps.append(await write(db, new=rent))
+        steps.append(await write(db, rent, {**rent, "date": "2024-05-12"}))
+        steps.append(await write(db, {**rent, "date": "2024-05-12"}, None))
+        return steps, await days(db), await reconcile_balances(db, fix=False)
+
+    steps, stored_days, report = asyncio.run(scenario())
+    # Each write hands back the balances it moved; pending and date-only changes move none
+    assert steps == [{}, {1: 150.0}, {1: 100.0, 2: 50.0}, {1: 70.0}, {}, {1: 100.0}]
+    assert stored_days == [(2, "2024-05-11", 50.0, 1)]
+    assert (report["drifted"], report["daysDrifted"]) == (0, 0)
+
+
+def test_reconcile_repairs_only_drifted_days_and_balances():
+    async def scenario():
+        db = await ledger({1: 100.0, 2: 20.0})
+        for created in (transaction(1), transaction(2, date="2024-05-11"), transaction(3, accountId=2)):
+            await write(db, new=created)
+        days_collection = db[BALANCE_DAYS_COLLECTION]
+        await days_collection.update_one({"accountId": 1, "date": "2024-05-11"}, {"$set": {"delta": -99.0}})
+        await days_collection.insert_one({"accountId": 2, "date": "2024-01-01", "delta": 5.0, "count": 1})
+        await db.accounts.update_one({"id": 2}, {"$set": {"balance": 1.0}})
+        untouched = await days_collection.find_one({"accountId": 1, "date": "2024-05-10"})
+        report = await reconcile_balances(db)
+        kept = await days_collection.find_one({"accountId": 1, "date": "2024-05-10"})
+        return report, untouched["_id"] == kept["_id"], await days(db), await balances_at(db, "2024-05-10")
+
+    report, kept_in_place, stored_days, at = asyncio.run(scenario())
+    assert (report["drifted"], report["corrected"]) == (1, 1)
+    assert (report["daysDrifted"], report["daysCorrected"]) == (2, 2)
+    assert {entry["id"]: entry["daysDrifted"] for entry in report["accounts"]} == {1: 1, 2: 1}
+    # Days that were right are left as they are rather than rewritten
+    assert kept_in_place
+    assert stored_days == [(1, "2024-05-10", -10.0, 1), (1, "2024-05-11", -10.0, 1), (2, "2024-05-10", -10.0, 1)]
+    assert at == [{"accountId": 1, "name": "Account 1", "balance": 90.0},
+                  {"accountId": 2, "name": "Account 2", "balance": 10.0}]
@@ -0,0 +1,185 @@
+import asyncio
+from typing import Optional
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pydantic import BaseModel
+
+from batch import BatchOperation, BatchRequest, _Plan, execute_batch
+from ids import IdAllocator
+
+
+class Item(BaseModel):
+    name: str
+    amount: Optional[float] = None
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def make_db(*documents):
+    db = AsyncMongoMockClient()["batch_test"]
+    await db.items.create_index("id", unique=True)
+    if documents:
+        await db.items.insert_many([dict(document) for document in documents])
+    return db
+
+
+def batch(*operations, ordered=True):
+    return BatchRequest(operations=[BatchOperation(**operation) for operation in operations], ordered=ordered)
+
+
+async def stored(db):
+    return {doc["id"]: doc async for doc in db.items.find({}, {"_id": 0})}
+
+
+def statuses(response):
+    return [result["status"] for result in response["results"]]
+
+
+def test_plan_tracks_create_update_delete_of_the_same_id():
+    plan = _Plan({}, Item, "id", None, iter([7]))
+    _, old, created = plan.step(BatchOperation(op="create", data={"name": "a", "amount": 1}))
+    assert old is None and created == {"name": "a", "amount": 1, "id": 7}
+
+    _, old, updated = plan.step(BatchOperation(op="update", id=7, data={"name": "b"}))
+    assert old == created
+    assert updated == {"name": "b", "amount": None, "id": 7}
+    assert plan.current[7] == updated
+
+    _, old, deleted = plan.step(BatchOperation(op="delete", id=7))
+    assert old == updated and deleted is None
+    assert 7 not in plan.current
+    with pytest.raises(ValueError, match="not found"):
+        plan.step(BatchOperation(op="update", id=7, data={"name": "c"}))
+
+
+def test_plan_passes_the_current_document_to_prepare():
+    seen = []
+
+    def prepare(document, old):
+        seen.append(old)
+        return {**document, "prepared": True}
+
+    plan = _Plan({1: {"id": 1, "name": "a", "amount": 2.0}}, Item, "id", prepare, None)
+    _, _, new = plan.step(BatchOperation(op="update", id=1, data={"name": "b", "amount": 3}))
+    assert seen == [{"id": 1, "name": "a", "amount": 2.0}]
+    assert new["prepared"] is True
+
+
+def test_create_update_delete_of_the_same_id_in_one_batch():
+    async def scenario():
+        db = await make_db()
+        response, applied = await execute_batch(db, "items", batch(
+            {"op": "create", "data": {"name": "a"}},
+            {"op": "update", "id": 1, "data": {"name": "b", "amount": 5}},
+            {"op": "create", "data": {"name": "c"}},
+            {"op": "delete", "id": 1},
+        ), Item, allocator=IdAllocator())
+        return response, applied, await stored(db)
+
+    response, applied, documents = run(scenario())
+    assert statuses(response) == ["ok", "ok", "ok", "ok"]
+    assert [result["id"] for result in response["results"]] == [1, 1, 2, 1]
+    assert response["succeeded"] == 4
+    assert applied[1] == ({"name": "a", "amount": None, "id": 1}, {"name": "b", "amount": 5, "id": 1})
+    assert applied[3] == ({"name": "b", "amount": 5, "id": 1}, None)
+    assert documents == {2: {"name": "c", "amount": None, "id": 2}}
+
+
+def test_ordered_batch_skips_everything_after_a_validation_error():
+    async def scenario():
+        db = await make_db({"id": 1, "name": "a"})
+        response, applied = await execute_batch(db, "items", batch(
+            {"op": "update", "id": 1, "data": {"name": "b"}},
+            {"op": "update", "id": 99, "data": {"name": "x"}},
+            {"op": "delete", "id": 1},
+        ), Item)
+        return response, applied, await stored(db)
+
+    response, applied, documents = run(scenario())
+    assert statuses(response) == ["ok", "error", "skipped"]
+    assert response["results"][1]["error"] == "id 99 not found"
+    assert (response["succeeded"], response["failed"], response["skipped"]) == (1, 1, 1)
+    assert len(applied) == 1
+    assert documents[1]["name"] == "b"
+
+
+def test_unordered_batch_attempts_every_operation():
+    async def scenario():
+        db = await make_db({"id": 1, "name": "a"}, {"id": 2, "name": "b"})
+        response, applied = await execute_batch(db, "items", batch(
+            {"op": "delete", "id": 99},
+            {"op": "update", "id": 1, "data": {"amount": 3}},
+            {"op": "bogus", "id": 2},
+            {"op": "delete", "id": 2},
+            ordered=False
+        ), Item)
+        return response, applied, await stored(db)
+
+    response, applied, documents = run(scenario())
+    assert statuses(response) == ["error", "error", "error", "ok"]
+    assert response["results"][1]["error"].startswith("name:")
+    assert response["results"][2]["error"].startswith("op must be one of")
+    assert [new for _, new in applied] == [None]
+    assert documents == {1: {"id": 1, "name": "a"}}
+
+
+def test_write_errors_map_back_to_request_positions():
+    async def scenario(ordered):
+        # The counter starts behind the stored ids, so the second create collides with id 2
+        db = await make_db({"id": 2, "name": "taken"})
+        response, applied = await execute_batch(db, "items", batch(
+            {"op": "delete", "id": 404},
+            {"op": "create", "data": {"name": "first"}},
+            {"op": "create", "data": {"name": "second"}},
+            {"op": "create", "data": {"name": "third"}},
+            ordered=ordered
+        ), Item, allocator=IdAllocator())
+        return response, applied, await stored(db)
+
+    response, applied, documents = run(scenario(ordered=False))
+    assert statuses(response) == ["error", "ok", "error", "ok"]
+    assert response["results"][2]["error"] == "Already exists"
+    assert [new["name"] for _, new in applied] == ["first", "third"]
+    assert sorted(documents) == [1, 2, 3]
+    assert documents[2]["name"] == "taken"
+
+    # Ordered, the validation error at index 0 stops the batch before anything is written
+    response, applied, documents = run(scenario(ordered=True))
+    assert statuses(response) == ["error", "skipped", "skipped", "skipped"]
+    assert applied == [] and sorted(documents) == [2]
+
+
+def test_ordered_write_error_skips_the_writes_after_it():
+    async def scenario():
+        db = await make_db({"id": 2, "name": "taken"})
+        response, applied = await execute_batch(db, "items", batch(
+            {"op": "create", "data": {"name": "first"}},
+            {"op": "create", "data": {"name": "second"}},
+            {"op": "update", "id": 2, "data": {"name": "renamed"}},
+        ), Item, allocator=IdAllocator())
+        return response, applied, await stored(db)
+
+    response, applied, documents = run(scenario())
+    assert statuses(response) == ["ok", "error", "skipped"]
+    assert response["results"][1] == {"index": 1, "status": "error", "error": "Already exists"}
+    assert [new["id"] for _, new in applied] == [1]
+    assert documents[2]["name"] == "taken"
+
+
+def test_updater_builds_the_update_document():
+    async def scenario():
+        db = await make_db({"id": 1, "name": "a", "amount": 10.0})
+        # Derived from the stored value at write time, like the account balance shift
+        response, _ = await execute_batch(db, "items", batch(
+            {"op": "update", "id": 1, "data": {"name": "b", "amount": 5}},
+        ), Item, updater=lambda update: [{"$set": {
+            "name": {"$literal": update["name"]}, "amount": {"$add": ["$amount", update["amount"]]}
+        }}])
+        return response, await stored(db)
+
+    response, documents = run(scenario())
+    assert statuses(response) == ["ok"]
+    assert documents[1] == {"id": 1, "name": "b", "amount": 15.0}
@@ -0,0 +1,64 @@
+import asyncio
+
+from cache import ReferenceCache
+
+
+def loader(value, calls):
+    async def load():
+        calls.append(value)
+        return value
+    return load
+
+
+def test_invalidation_drops_dependent_namespaces_only():
+    async def scenario():
+        cache, calls = ReferenceCache(), []
+        for namespace in ("vendors", "parties", "categories"):
+            await cache.lookup(namespace, 1, loader(namespace, calls))
+        cache.invalidate("vendors")
+        for namespace in ("vendors", "parties", "categories"):
+            await cache.lookup(namespace, 1, loader(namespace, calls))
+        return calls, cache.stats()
+
+    calls, stats = asyncio.run(scenario())
+    assert calls == ["vendors", "parties", "categories", "vendors", "parties"]
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (1, 5, 1)
+
+
+def test_missing_values_are_not_cached():
+    async def scenario():
+        cache, calls = ReferenceCache(), []
+        await cache.lookup("clients", 7, loader(None, calls))
+        return await cache.lookup("clients", 7, loader({"id": 7}, calls)), calls
+
+    assert asyncio.run(scenario()) == ({"id": 7}, [None, {"id": 7}])
+
+
+def test_load_racing_an_invalidation_is_not_cached():
+    async def scenario():
+        cache, calls = ReferenceCache(), []
+
+        async def stale():
+            # A write lands while the old value is being read
+            cache.invalidate("accounts")
+            return "old"
+
+        first = await cache.lookup("accounts", 1, stale)
+        second = await cache.lookup("accounts", 1, loader("new", calls))
+        return first, second
+
+    assert asyncio.run(scenario()) == ("old", "new")
+
+
+def test_max_age_and_clear_force_reloads():
+    async def scenario():
+        cache, calls = ReferenceCache(), []
+        await cache.lookup("categories", 1, loader("a", calls))
+        await cache.lookup("categories", 1, loader("b", calls), max_age=60)
+        await asyncio.sleep(0.02)
+        await cache.lookup("categories", 1, loader("c", calls), max_age=0.01)
+        cache.clear()
+        await cache.lookup("categories", 1, loader("d", calls))
+        return calls
+
+    assert asyncio.run(scenario()) == ["a", "c", "d"]
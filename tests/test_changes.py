@@ -0,0 +1,101 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+import changes
+from changes import CHANGES_COLLECTION, REORDER_WINDOW, ChangeFeed, _SeenSeqs, diff_events, update_event
+
+
+def test_seen_seqs_accepts_late_events_once():
+    seen = _SeenSeqs(9)
+    assert seen.add(11)
+    # 10 was reserved before 11 but inserted after it
+    assert seen.add(10)
+    assert not seen.add(10)
+    assert not seen.add(11)
+    assert seen.add(11 + REORDER_WINDOW)
+    assert seen.floor == 11
+    assert not seen.add(11)
+    assert seen.add(12)
+
+
+def test_diff_events_skips_unchanged_updates_and_internal_fields():
+    old = {"id": 1, "name": "Rent", "searchTerms": ["rent"]}
+    events = diff_events("transactions", [
+        (None, {"_id": "x", "id": 2, "name": "Salary"}),
+        (old, {**old, "name": "Rent", "searchTerms": ["rent", "home"]}),
+        (old, {**old, "name": "Housing"}),
+        (old, None),
+    ])
+    assert events == [
+        {"collection": "transactions", "op": "create", "id": 2, "data": {"id": 2, "name": "Salary"}},
+        {"collection": "transactions", "op": "update", "id": 1, "data": {"name": "Housing"}},
+        {"collection": "transactions", "op": "delete", "id": 1},
+    ]
+
+
+def insert(db, *seqs):
+    return db[CHANGES_COLLECTION].insert_many([{**update_event("accounts", seq, {}), "seq": seq} for seq in seqs])
+
+
+async def received(stream, count):
+    chunks = []
+    while len(chunks) < count:
+        chunk = await asyncio.wait_for(stream.__anext__(), 1)
+        if chunk.startswith(b"id: "):
+            chunks.append(int(chunk.split(b"\n")[0][4:]))
+    return chunks
+
+
+def test_resume_replays_events_inserted_out_of_order():
+    async def scenario():
+        db = AsyncMongoMockClient()["changes_test"]
+        feed = ChangeFeed()
+        await insert(db, *range(1, 10), 11, 12, 10)
+        stream = feed.event_stream(db, last_event_id=11, heartbeat=60)
+        replayed = await received(stream, 12)
+        # Live events already replayed aren't sent again
+        feed._publish({**update_event("accounts", 12, {}), "seq": 12})
+        feed._publish({**update_event("accounts", 13, {}), "seq": 13})
+        live = await received(stream, 1)
+        await stream.aclose()
+        return replayed, live
+
+    replayed, live = asyncio.run(scenario())
+    assert replayed == [*range(1, 13)]
+    assert live == [13]
+
+
+def test_resume_too_far_back_sends_reset():
+    async def scenario():
+        db = AsyncMongoMockClient()["changes_test"]
+        await insert(db, 5, 6)
+        stream = ChangeFeed().event_stream(db, last_event_id=2, heartbeat=60)
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert b"event: reset" in asyncio.run(scenario())
+
+
+def test_run_publishes_late_inserts_once(monkeypatch):
+    monkeypatch.setattr(changes, "RETRY_SECONDS", 0.01)
+
+    async def scenario():
+        db = AsyncMongoMockClient()["changes_test"]
+        feed = ChangeFeed()
+        await insert(db, 1)
+        with feed.subscribe() as queue:
+            tailer = asyncio.create_task(feed.run(db))
+            await asyncio.sleep(0.05)
+            await insert(db, 3)
+            await asyncio.sleep(0.05)
+            await insert(db, 2)
+            delivered = [(await asyncio.wait_for(queue.get(), 1))["seq"] for _ in range(2)]
+            await asyncio.sleep(0.05)
+            tailer.cancel()
+            return delivered, queue.empty()
+
+    delivered, drained = asyncio.run(scenario())
+    assert delivered == [3, 2]
+    assert drained
@@ -0,0 +1,29 @@
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from server import decode_cursor, encode_cursor
+
+
+def test_decode_cursor_round_trip():
+    assert decode_cursor(encode_cursor({"date": "2024-05-01", "id": 42})) == {
+        "$or": [
+            {"date": {"$lt": "2024-05-01"}},
+            {"date": "2024-05-01", "id": {"$lt": 42}}
+        ]
+    }
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"{}").decode(),
+    base64.urlsafe_b64encode(json.dumps(["2024-05-01"]).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps(["2024-05-01", "42"]).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps([20240501, 42]).encode()).decode(),
+])
+def test_decode_cursor_rejects_malformed_cursors(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
@@ -0,0 +1,43 @@
+from datetime import date, datetime
+
+import pytest
+
+from dates import is_month_aligned, normalize_date
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2024-05-01", "2024-05-01"),
+    (" 2024-05-01 ", "2024-05-01"),
+    ("2024-05-01T23:30:00+05:00", "2024-05-01"),
+    ("2024-05-01T10:00:00Z", "2024-05-01"),
+    (date(2024, 5, 1), "2024-05-01"),
+    (datetime(2024, 5, 1, 23, 59), "2024-05-01"),
+])
+def test_normalize_date(value, expected):
+    assert normalize_date(value) == expected
+
+
+@pytest.mark.parametrize("value", ["05/01/2024", "2024-02-30", "", "yesterday"])
+def test_normalize_date_rejects_other_formats(value):
+    with pytest.raises(ValueError):
+        normalize_date(value)
+
+
+@pytest.mark.parametrize("date_from, date_to, expected", [
+    (None, None, True),
+    ("2024-01-01", "2024-03-31", True),
+    ("2024-02-01", "2024-02-29", True),
+    ("2023-02-01", "2023-02-28", True),
+    ("2024-01-01", None, True),
+    (None, "2024-04-30", True),
+    ("2024-01-02", "2024-03-31", False),
+    ("2024-01-01", "2024-03-30", False),
+    ("2024-02-01", "2024-02-28", False),
+])
+def test_is_month_aligned(date_from, date_to, expected):
+    assert is_month_aligned(date_from, date_to) is expected
+
+
+def test_is_month_aligned_rejects_impossible_dates():
+    with pytest.raises(ValueError):
+        is_month_aligned("2024-02-30", None)
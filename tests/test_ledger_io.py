@@ -0,0 +1,69 @@
+import asyncio
+import csv
+import io
+
+from mongomock_motor import AsyncMongoMockClient
+
+from balances import BALANCE_DAYS_COLLECTION
+from ids import IdAllocator
+from ledger_io import EXPORT_FIELDS, export_csv, import_transactions, read_rows
+from rollups import ROLLUPS_COLLECTION
+from server import TransactionCreate
+
+SOURCE = """date,type,amount,category,account,clientVendor,status,notes
+2024-05-02,income,1200.50,Salary,Checking,Acme,completed,May pay
+2024-05-03T09:30:00,expense,80,groceries,Checking,,pending,
+2024-05-04,expense,abc,Groceries,Checking,,completed,
+2024-05-05,expense,15.25,Groceries,Savings,,completed,"corner, shop"
+"""
+
+
+async def ledger(name):
+    db = AsyncMongoMockClient()[name]
+    await db.categories.insert_many([{"id": 1, "name": "Salary"}, {"id": 2, "name": "Groceries"}])
+    await db.accounts.insert_many([{"id": 1, "name": "Checking", "balance": 0.0, "openingBalance": 0.0}])
+    await db.clients.insert_one({"id": 1, "name": "Acme"})
+    return db
+
+
+async def load(db, text):
+    return await import_transactions(db, read_rows(io.BytesIO(text.encode()), "csv"), TransactionCreate, IdAllocator())
+
+
+async def export(db):
+    chunks = [chunk async for chunk in export_csv(db.transactions.find({}, {"_id": 0}).sort("id", 1))]
+    return "".join(chunks)
+
+
+async def derived(db):
+    account = await db.accounts.find_one({"id": 1})
+    rollups = await db[ROLLUPS_COLLECTION].count_documents({"count": {"$gt": 0}})
+    days = await db[BALANCE_DAYS_COLLECTION].count_documents({})
+    return account["balance"], rollups, days
+
+
+def test_import_reports_bad_rows_and_exports_what_it_read():
+    async def scenario():
+        source = await ledger("import_test")
+        report = await load(source, SOURCE)
+        exported = await export(source)
+        # Ids and names are exported alongside each other; the copy resolves by id
+        target = await ledger("round_trip_test")
+        copied = await load(target, exported)
+        return report, exported, copied, await export(target), await derived(source), await derived(target)
+
+    report, exported, copied, re_exported, source_state, target_state = asyncio.run(scenario())
+    assert (report["imported"], report["failed"]) == (2, 2)
+    assert [error["row"] for error in report["errors"]] == [4, 5]
+    assert "Account 'Savings' not found" in report["errors"][1]["error"]
+
+    rows = list(csv.DictReader(io.StringIO(exported)))
+    assert list(rows[0]) == EXPORT_FIELDS
+    assert [(row["date"], row["amount"], row["categoryName"], row["clientVendorName"], row["status"]) for row in rows] == [
+        ("2024-05-02", "1200.5", "Salary", "Acme", "completed"),
+        ("2024-05-03", "80.0", "Groceries", "", "pending"),
+    ]
+    assert (copied["imported"], copied["failed"]) == (2, 0)
+    assert re_exported == exported
+    # Only the completed salary moves the balance; both rows are rolled up
+    assert source_state == target_state == (1200.5, 2, 1)
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from changes import update_event
+
+
+def test_lifespan_starts_the_background_work(monkeypatch):
+    mongo = AsyncMongoMockClient()
+    monkeypatch.setenv("DB_NAME", "lifespan_test")
+    monkeypatch.setattr(server, "create_mongo_client", lambda event_listeners=(): mongo)
+
+    async def ensure_plain_feed(db):
+        # mongomock can't create capped collections; its cursors ignore tailing and just poll
+        await db.create_collection("change_events")
+
+    monkeypatch.setattr(server, "ensure_feed", ensure_plain_feed)
+    asyncio.run(mongo["lifespan_test"].accounts.insert_one({
+        "id": 1, "name": "Checking", "type": "checking", "balance": 5.0, "openingBalance": 5.0,
+        "lowBalanceThreshold": 100.0
+    }))
+
+    with TestClient(server.app) as client:
+        assert server.client is mongo and server.db.name == "lifespan_test"
+
+        # The alert engine evaluates everything once it starts
+        deadline = time.monotonic() + 5
+        alerts = []
+        while not alerts and time.monotonic() < deadline:
+            alerts = client.get("/api/alerts").json()
+            time.sleep(0.05)
+        assert [alert["accountId"] for alert in alerts] == [1]
+
+        # The change feed tailer hands recorded events to this worker's subscribers
+        async def next_change():
+            with server.feed.subscribe() as queue:
+                await server.feed.record(server.db, [update_event("accounts", 1, {"name": "Main"})])
+                while True:
+                    event = await asyncio.wait_for(queue.get(), 5)
+                    if event["collection"] == "accounts":
+                        return event
+
+        change = client.portal.call(next_change)
+        assert (change["collection"], change["id"], change["data"]) == ("accounts", 1, {"name": "Main"})
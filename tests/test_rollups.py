@@ -0,0 +1,76 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from rollups import ROLLUPS_COLLECTION, apply_transaction_change, apply_transactions, rollup_pipeline
+
+
+def transaction(id, date="2024-05-10", type="expense", amount=10.0, categoryId=1, accountId=1, status="completed"):
+    return {"id": id, "date": date, "type": type, "amount": amount,
+            "categoryId": categoryId, "accountId": accountId, "status": status}
+
+
+async def write(db, old=None, new=None):
+    # What the transaction handlers do: the ledger write, then the rollup delta
+    if old:
+        await db.transactions.delete_one({"id": old["id"]})
+    if new:
+        await db.transactions.insert_one(dict(new))
+    await apply_transaction_change(db, old=old, new=new)
+
+
+async def rollups(db):
+    # Keys whose contributions all moved away are left at zero rather than deleted
+    docs = await db[ROLLUPS_COLLECTION].find({}, {"_id": 0}).to_list(None)
+    return sorted(
+        (tuple(doc[field] for field in ("month", "categoryId", "accountId", "type", "status")),
+         round(doc["total"], 2), doc["count"])
+        for doc in docs if doc["count"]
+    )
+
+
+async def rebuilt(db):
+    docs = await db.transactions.aggregate(rollup_pipeline()).to_list(None)
+    return sorted(
+        (tuple(doc[field] for field in ("month", "categoryId", "accountId", "type", "status")),
+         round(doc["total"], 2), doc["count"])
+        for doc in docs
+    )
+
+
+def test_incremental_rollups_match_a_rebuild_after_updates_and_deletes():
+    async def scenario():
+        db = AsyncMongoMockClient()["rollups_test"]
+        a, b, c = transaction(1), transaction(2, amount=25.5), transaction(3, type="income", amount=100)
+        for created in (a, b, c):
+            await write(db, new=created)
+        # Amount, month, category, account and status changes each move the contribution
+        await write(db, a, {**a, "amount": 12.25})
+        await write(db, b, {**b, "date": "2024-06-01", "categoryId": 2})
+        await write(db, c, {**c, "accountId": 2, "status": "pending"})
+        await write(db, {**a, "amount": 12.25}, None)
+        return await rollups(db), await rebuilt(db)
+
+    incremental, expected = asyncio.run(scenario())
+    assert incremental == expected
+    assert incremental == [
+        (("2024-05", 1, 2, "income", "pending"), 100.0, 1),
+        (("2024-06", 2, 1, "expense", "completed"), 25.5, 1),
+    ]
+
+
+def test_bulk_apply_sums_per_key_and_removes_with_negative_sign():
+    async def scenario():
+        db = AsyncMongoMockClient()["rollups_test"]
+        batch = [transaction(1), transaction(2, amount=5), transaction(3, date="2024-04-30")]
+        await apply_transactions(db, batch)
+        added = await rollups(db)
+        await apply_transactions(db, batch[:2], sign=-1)
+        return added, await rollups(db)
+
+    added, after_removal = asyncio.run(scenario())
+    assert added == [
+        (("2024-04", 1, 1, "expense", "completed"), 10.0, 1),
+        (("2024-05", 1, 1, "expense", "completed"), 15.0, 2),
+    ]
+    assert after_removal == [(("2024-04", 1, 1, "expense", "completed"), 10.0, 1)]
@@ -0,0 +1,18 @@
+import pytest
+
+from versions import etag_matches
+
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    (None, False),
+    ("", False),
+    ("*", True),
+    (' * ', True),
+    ('W/"categories.3"', True),
+    ('"categories.3"', True),
+    ('"categories.2", W/"categories.3"', True),
+    ('W/"categories.2"', False),
+    ('W/"categories.3-x"', False),
+])
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, 'W/"categories.3"') is expected